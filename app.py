@@ -1,173 +1,19 @@
-import os
-import sys
-import base64
-import logging
-import pyaudio
-import streamlit as st
 import requests
-from langchain.memory import ConversationBufferMemory
-from src.logger import logger
-from utils import record_audio_chunk, transcribe_audio, play_text_to_speech, load_whisper
 
-chunk_file = 'temp_audio_chunk.wav'
-model = load_whisper()
+from voice_ui import Responder, run_app
 
-logging.basicConfig(level=logging.INFO)
 
-# Streamlit Page Configuration
-st.set_page_config(
-    page_title="Euron Bot - An Intelligent Streamlit Assistant",
-    page_icon="images/euron_bot.png",
-    layout="wide",
-    initial_sidebar_state="expanded",
-    menu_items={
-        "About": """
-            ## Euron Voice Assistant
-            
-            **GitHub**: https://github.com/saisubhasish/EuronVoiceAssistant
-            
-            The AI Assistant aims to help users manage daily tasks, set reminders, 
-            control smart home devices, and provide information on demand. This versatile 
-            voice assistant has been designed to integrate seamlessly with smart home devices 
-            and calendar apps, ensuring efficient task management and accurate, timely information 
-            for users. The assistant is trained on the latest updates and documentation relevant to 
-            smart home technology and task management applications.
-        """
-    }
-)
+class ApiResponder(Responder):
+    """Gets replies from the FastAPI server, which keeps the history for this conversation."""
 
-# Streamlit Updates and Expanders
-st.title("Euron Voice Assistant")
+    url = "http://localhost:8000/chat"
 
-def img_to_base64(image_path):
-    """Convert image to base64"""
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode()
-
-def main():
-    """
-    Display Streamlit updates and handle the chat interface.
-    """
-    
-    # Inject custom CSS for glowing border effect
-    st.markdown(
-        """
-        <style>
-        .cover-glow {
-            width: 100%;
-            height: auto;
-            padding: 3px;
-            box-shadow: 
-                0 0 5px #330000,
-                0 0 10px #660000,
-                0 0 15px #990000,
-                0 0 20px #CC0000,
-                0 0 25px #FF0000,
-                0 0 30px #FF3333,
-                0 0 35px #FF6666;
-            position: relative;
-            z-index: -1;
-            border-radius: 30px;  /* Rounded corners */
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    # Load and display sidebar image with glowing effect
-    img_path = "images/euron_bot.png"
-    img_base64 = img_to_base64(img_path)
-    st.sidebar.markdown(
-        f'<img src="data:image/png;base64,{img_base64}" class="cover-glow">',
-        unsafe_allow_html=True,
-    )
-    st.sidebar.markdown("---")
-    
-    # Sidebar for Mode Selection
-    mode = st.sidebar.radio("Select Mode:", options=["Talk with Euron Assistant"], index=0)
-    st.sidebar.markdown("---")
-    # Toggle checkbox in the sidebar for basic interactions
-    show_basic_info = st.sidebar.toggle("Show Basic Interactions", value=True)
-
-    # Display the st.info box if the checkbox is checked
-    if show_basic_info:
-        st.sidebar.markdown("""
-        ### Basic Interactions
-        - **Ask About Streamlit**: Ask your questions about Streamlit's latest updates, features, or issues.
-        - **Search for Code**: Use keywords like 'code example', 'syntax', or 'how-to' to get relevant code snippets.
-        - **Navigate Updates**: Switch to 'Updates' mode to browse the latest Streamlit updates in detail.
-        """)
-
-    # Add another toggle checkbox in the sidebar for advanced interactions
-    show_advanced_info = st.sidebar.toggle("Show Advanced Interactions", value=False)
-
-    # Display the st.info box if the checkbox is checked
-    if show_advanced_info:
-        st.sidebar.markdown("""
-        ### Advanced Interactions
-        - **Generate an App**: Use keywords like **generate app**, **create app** to get a basic Streamlit app code.
-        - **Code Explanation**: Ask for **code explanation**, **walk me through the code** to understand the underlying logic of Streamlit code snippets.
-        - **Project Analysis**: Use **analyze my project**, **technical feedback** to get insights and recommendations on your current Streamlit project.
-        - **Debug Assistance**: Use **debug this**, **fix this error** to get help with troubleshooting issues in your Streamlit app.
-        """)
-
-    st.sidebar.markdown("---")
-    # Load image and convert to base64
-    img_path = "images/euron.png"  # Replace with the actual image path
-    img_base64 = img_to_base64(img_path)
-
-    # Display image with custom CSS class for glowing effect
-    st.sidebar.markdown(
-        f'<img src="data:image/png;base64,{img_base64}" class="cover-glow">',
-        unsafe_allow_html=True,
-    )
-    
-    # Handle Chat and Update Modes
-    if mode == "Talk with Euron Assistant":
-        if st.button("Start Recording"):
-            memory = ConversationBufferMemory(memory_key="chat_history")
-            while True:
-                try:
-                    # Audio Stream Initialization
-                    audio = pyaudio.PyAudio()
-                    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=1024)
-
-                    # Record and save audio chunk
-                    record_audio_chunk(audio, stream)
-
-                    text = transcribe_audio(model, chunk_file)
-
-                    if text is not None:
-                        st.markdown(
-                            f'<div style="background-color: #f0f0f0; padding: 10px; border-radius: 5px;">Customer 👤: {text}</div>',
-                            unsafe_allow_html=True)
-                        logger.info(f"User Question: {text}")
-
-                        os.remove(chunk_file)
-
-                        # Send request to FastAPI for response
-                        response = requests.post("http://localhost:8000/chat", json={"message": text})
-                        response_llm = response.json().get("response", "Sorry, I didn't get that.")
-                        
-                        st.markdown(
-                            f'<div style="background-color: #f0f0f0; padding: 10px; border-radius: 5px;">AI Assistant 🤖: {response_llm}</div>',
-                            unsafe_allow_html=True)
-
-                        logger.info(f"AI Response: {response_llm}\n")
-
-                        play_text_to_speech(text=response_llm)
-                    else:
-                        stream.stop_stream()
-                        stream.close()
-                        audio.terminate()
-                        logger.info("End Audio Stream as user did not say anything")
-                        break  # Exit the while loop
-                except OSError as e:
-                    logger.error(f"Error: {e}")
-                    logger.info("No default audio device found. Exiting...")
-                    sys.exit(1)
-            logger.info("End Conversation")
+    def reply(self, text, turn_id):
+        # The turn id ties the server's metrics for this turn to ours
+        response = requests.post(self.url, json={"message": text, "session_id": self.session_id},
+                                 headers={"X-Turn-ID": turn_id})
+        return [response.json().get("response", "Sorry, I didn't get that.")]
 
 
 if __name__ == "__main__":
-    main()
+    run_app(ApiResponder)
@@ -0,0 +1,127 @@
+"""
+Whisper accuracy-versus-speed benchmark of the inference profiles.
+
+Transcribes every fixture that has a `<name>.txt` transcript with each Whisper model size and
+profile, on CPU, and reports:
+- WER: word error rate against the transcripts, after Whisper's English text normalization
+- RTF: real-time factor, decoding time divided by audio duration (lower is faster)
+- the speed-up and WER change of each profile relative to the default one
+
+    python -m benchmarks.asr_profiles --models tiny.en base.en --repeats 5 --output asr.json
+
+The default profile runs first for every model: the low-latency profile pins the torch
+thread count for the whole process, which would otherwise skew the default timings.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import platform
+
+import numpy as np
+from whisper.normalizers import EnglishTextNormalizer
+
+from benchmarks.turn_latency import FIXTURE_DIR, SAMPLE_RATE, load_fixtures, make_fixtures, summarize, git_revision
+from src.model_manager import PROFILES, model_manager
+from utils import transcribe_audio
+
+_normalize = EnglishTextNormalizer()
+
+
+def word_errors(reference, hypothesis):
+    """Return (edit distance in words, reference length) after normalizing both texts."""
+    ref, hyp = _normalize(reference).split(), _normalize(hypothesis).split()
+    previous = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        current = [i]
+        for j, other in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def run_profile(size, profile, fixtures, repeats):
+    """Transcribe the fixtures with one model and profile; return the per-fixture results."""
+    model = model_manager.get(size=size, device="cpu", profile=profile)
+    results = []
+    for name, samples, transcript in fixtures:
+        audio = samples.astype(np.float32) / 32768.0
+        duration = samples.size / SAMPLE_RATE
+        rtfs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            text = transcribe_audio(model, audio) or ""
+            rtfs.append((time.perf_counter() - start) / duration)
+        errors, words = word_errors(transcript, text)
+        results.append({"fixture": name, "seconds": duration, "errors": errors, "words": words,
+                        "rtf": rtfs, "text": text.strip()})
+        print(f"{size:>10} {profile:<16} {name:<16} RTF {np.median(rtfs):6.3f}  {text.strip()!r}")
+    return results
+
+
+def aggregate(results):
+    errors = sum(r["errors"] for r in results)
+    words = sum(r["words"] for r in results)
+    return {
+        "wer": errors / max(1, words),
+        "rtf": summarize([rtf for r in results for rtf in r["rtf"]]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["tiny.en", "base.en"], help="Whisper model sizes")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=PROFILES, help="Profiles to compare")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="Directory of WAV fixtures")
+    parser.add_argument("--repeats", type=int, default=3, help="Decodes per fixture, model and profile")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if not glob.glob(os.path.join(args.fixtures, "*.wav")):
+        make_fixtures(args.fixtures)
+    fixtures = [f for f in load_fixtures(args.fixtures) if f[2]]
+    if not fixtures:
+        print(f"No fixtures with a transcript in {args.fixtures}")
+        return 1
+
+    # Profile-major order so every default run happens before any thread pinning
+    profiles = sorted(args.profiles, key=lambda p: p != "default")
+    details = {}
+    for profile in profiles:
+        for size in args.models:
+            details.setdefault(size, {})[profile] = run_profile(size, profile, fixtures, args.repeats)
+
+    summary = {size: {profile: aggregate(r) for profile, r in by_profile.items()}
+               for size, by_profile in details.items()}
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "repeats": args.repeats,
+        "models": model_manager.stats(),
+        "summary": summary,
+        "details": details,
+    }
+
+    print(f"\n{'model':>10} {'profile':<16} {'WER':>7} {'RTF p50':>8} {'RTF p95':>8} {'speed-up':>9} {'dWER':>7}")
+    for size, by_profile in summary.items():
+        base = by_profile.get("default")
+        for profile, stats in by_profile.items():
+            speedup = base["rtf"]["p50"] / stats["rtf"]["p50"] if base else float("nan")
+            delta = stats["wer"] - base["wer"] if base else float("nan")
+            print(f"{size:>10} {profile:<16} {stats['wer'] * 100:6.1f}% {stats['rtf']['p50']:8.3f} "
+                  f"{stats['rtf']['p95']:8.3f} {speedup:8.2f}x {delta * 100:+6.1f}%")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Local stand-in for the Groq chat completions API.
+
+Serves the OpenAI-compatible `/openai/v1/chat/completions` route that the Groq client calls,
+with a fixed reply and a configurable delay, so benchmarks run without network access.
+Point the assistant at it with GROQ_API_BASE=http://127.0.0.1:<port>.
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Sure, please tell me your customer ID first."
+
+
+def _completion(model, content, prompt_tokens, completion_tokens):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def _chunk(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class StubLLMServer:
+    """
+    Threaded HTTP server answering every chat completion with `reply`.
+
+    Args:
+        reply (str): Text returned for every request.
+        first_token_ms (float): Delay before the first byte, emulating queueing and prefill.
+        token_ms (float): Delay between streamed words, emulating generation speed.
+    """
+
+    def __init__(self, reply=DEFAULT_REPLY, first_token_ms=150.0, token_ms=10.0, host="127.0.0.1", port=0):
+        self.reply = reply
+        self.first_token = first_token_ms / 1000
+        self.token_delay = token_ms / 1000
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                model = body.get("model", "stub")
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+                words = server.reply.split(" ")
+                time.sleep(server.first_token)
+
+                if not body.get("stream"):
+                    time.sleep(server.token_delay * len(words))
+                    payload = json.dumps(_completion(model, server.reply, prompt_tokens, len(words))).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [_chunk(model, {"role": "assistant", "content": ""})]
+                events += [_chunk(model, {"content": (" " if i else "") + word}) for i, word in enumerate(words)]
+                events.append(_chunk(model, {}, finish_reason="stop"))
+                for i, event in enumerate(events):
+                    self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+                    if i:
+                        time.sleep(server.token_delay)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,339 @@
+"""
+End-to-end turn latency benchmark.
+
+Drives the real capture -> transcription -> LLM -> text-to-speech path of `utils` with:
+- WAV fixtures from benchmarks/fixtures instead of a microphone
+- a local OpenAI-compatible stub server instead of Groq
+- a null audio sink instead of speakers
+
+Every turn goes to the LLM: the response cache and the intent router are off, and the Groq
+rate limits are lifted, unless those variables are set in the environment. Otherwise repeats
+would be answered from the cache and the stub's speed would be capped at the Groq quota.
+
+Everything runs on CPU without network access. Each stage is reported as p50/p95/p99 per
+Whisper model size and utterance length, and the results can be written as JSON and compared
+against an earlier run to catch regressions:
+
+    python -m benchmarks.turn_latency --models tiny.en base.en --repeats 5 --output bench.json
+    python -m benchmarks.turn_latency --baseline bench.json --tolerance 0.15
+
+A pure-noise case also feeds the endpointer 20 s of background noise at several levels and
+reports how much of it was taken for speech.
+
+Put recorded 16-bit WAV files (with an optional `<name>.txt` transcript next to each) in
+benchmarks/fixtures. If the directory is empty, fixtures are synthesized with espeak-ng.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import platform
+import subprocess
+
+import numpy as np
+
+# Read when the engine modules are imported, so set before importing them
+os.environ.setdefault("RESPONSE_CACHE", "0")
+os.environ.setdefault("INTENT_ROUTER", "0")
+os.environ.setdefault("GROQ_RPM", "0")
+os.environ.setdefault("GROQ_TPM", "0")
+
+from benchmarks.stub_llm import StubLLMServer
+from src.audio import read_wav_bytes, resample, to_wav_bytes, write_wav
+from src.audio_sink import NullSink
+from src.endpointer import Endpointer
+from src.model_manager import model_manager
+from src.session_store import new_memory
+from src.tts import SpeechPipeline
+from src.tts_backends import TTSBackend, EspeakBackend
+from utils import (record_audio, transcribe_audio, get_response_llm, play_text_to_speech, load_whisper,
+                   set_speech_pipeline)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SAMPLE_RATE = 16000
+
+# Typical caller turns, from a one-word answer to a long request
+FIXTURE_PHRASES = {
+    "yes": "Yes.",
+    "customer_id": "My customer ID is forty eight.",
+    "lights": "Please turn off the lights in the living room.",
+    "reminder": "Remind me to call my mother tomorrow at six in the evening.",
+    "appointment": "I would like to book an appointment for next Tuesday at ten thirty in the morning, "
+                   "and please send me a confirmation message when it is done.",
+}
+
+# Background levels (int16 RMS) of the pure-noise endpointing case: a quiet office up to a loud room
+NOISE_LEVELS = (30, 300, 450, 600)
+
+STAGES = ["capture", "endpoint_delay", "transcribe", "llm", "tts_first_audio", "tts", "response_latency", "turn"]
+
+
+class WavStream:
+    """
+    Stand-in for a PyAudio input stream that plays a fixture instead of the microphone.
+
+    The speech is surrounded by low-level noise so the endpointer sees a realistic onset
+    and trailing silence; `speech_end` marks where the fixture's audio ends.
+    """
+
+    def __init__(self, samples, lead_s=0.5, tail_s=3.0, noise_level=30, seed=0):
+        rng = np.random.default_rng(seed)
+        lead = rng.normal(0, noise_level, int(lead_s * SAMPLE_RATE))
+        tail = rng.normal(0, noise_level, int(tail_s * SAMPLE_RATE))
+        self.audio = np.concatenate([lead, samples.astype(np.float64), tail]).astype(np.int16)
+        self.speech_end = lead.size + samples.size
+        self.position = 0
+
+    def read(self, num_frames, exception_on_overflow=True):
+        chunk = self.audio[self.position:self.position + num_frames]
+        if chunk.size < num_frames:
+            chunk = np.concatenate([chunk, np.zeros(num_frames - chunk.size, dtype=np.int16)])
+        self.position += num_frames
+        return chunk.tobytes()
+
+
+def load_fixtures(directory):
+    """Return (name, int16 samples at 16 kHz, transcript or None) for every WAV in the directory."""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        with open(path, "rb") as f:
+            samples, rate = read_wav_bytes(f.read())
+        transcript_path = os.path.splitext(path)[0] + ".txt"
+        transcript = None
+        if os.path.exists(transcript_path):
+            with open(transcript_path, encoding="utf-8") as f:
+                transcript = f.read().strip()
+        fixtures.append((os.path.splitext(os.path.basename(path))[0], resample(samples, rate, SAMPLE_RATE), transcript))
+    return fixtures
+
+
+def make_fixtures(directory):
+    """Synthesize the standard fixture phrases with espeak-ng (offline)."""
+    backend = EspeakBackend(sample_rate=SAMPLE_RATE)
+    os.makedirs(directory, exist_ok=True)
+    for name, text in FIXTURE_PHRASES.items():
+        samples, rate = read_wav_bytes(backend.synthesize(text))
+        write_wav(os.path.join(directory, f"{name}.wav"), samples, rate)
+        with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(f"Wrote {len(FIXTURE_PHRASES)} fixtures to {directory}")
+
+
+def length_bucket(seconds):
+    if seconds < 2:
+        return "short"
+    if seconds < 5:
+        return "medium"
+    return "long"
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "n": int(values.size),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+    }
+
+
+class SilenceBackend(TTSBackend):
+    """Produces 300 ms of silence per word; used when espeak-ng is not installed."""
+    name = "silence"
+
+    def synthesize(self, text, language='en', slow=False):
+        samples = np.zeros(int(0.3 * self.sample_rate * len(text.split())), dtype=np.int16)
+        return to_wav_bytes(samples, self.sample_rate)
+
+
+class TimingSink(NullSink):
+    """Null sink that remembers when the first buffer of a reply was queued."""
+    first_play = None
+
+    def play(self, samples, sample_rate=None):
+        if self.first_play is None:
+            self.first_play = time.perf_counter()
+        return super().play(samples, sample_rate)
+
+
+def offline_tts_backend():
+    """Return espeak-ng if it is installed, otherwise the silence backend."""
+    try:
+        return EspeakBackend()
+    except RuntimeError:
+        return SilenceBackend()
+
+
+def run_turn(model, samples, sink):
+    """Run one full turn on a fixture and return the time spent in each stage, in seconds."""
+    memory = new_memory()
+    stream = WavStream(samples)
+    sink.first_play = None
+
+    start = time.perf_counter()
+    audio = record_audio(stream)
+    captured = time.perf_counter()
+    # Audio the endpointer had to hear after the speech ended before it closed the utterance
+    endpoint_delay = max(0, stream.position - stream.speech_end) / SAMPLE_RATE
+    text = transcribe_audio(model, audio) or ""
+    transcribed = time.perf_counter()
+    reply = get_response_llm(text, memory)
+    answered = time.perf_counter()
+    play_text_to_speech(reply)
+    spoken = time.perf_counter()
+
+    first_audio = (sink.first_play or spoken) - answered
+    return {
+        "capture": captured - start,
+        "endpoint_delay": endpoint_delay,
+        "transcribe": transcribed - captured,
+        "llm": answered - transcribed,
+        "tts_first_audio": first_audio,
+        "tts": spoken - answered,
+        # What the caller experiences: from the end of their speech to the first sound of the reply
+        "response_latency": endpoint_delay + (transcribed - captured) + (answered - transcribed) + first_audio,
+        "turn": spoken - start,
+    }, text
+
+
+def noise_endpointing(levels=NOISE_LEVELS, seconds=20.0, seed=0):
+    """
+    Feed the endpointer pure noise, without any speech, and report what it took for speech.
+
+    Returns:
+        dict: Per noise RMS level, the number of utterances and their total length in seconds.
+    """
+    rng = np.random.default_rng(seed)
+    results = {}
+    for level in levels:
+        endpointer = Endpointer(sample_rate=SAMPLE_RATE)
+        frame_length = endpointer.frame_length
+        noise = rng.normal(0, level, int(seconds * SAMPLE_RATE)).clip(-32768, 32767).astype(np.int16)
+        segments = []
+        for frame in noise[:noise.size - noise.size % frame_length].reshape(-1, frame_length):
+            segment = endpointer.process(frame)
+            if segment is not None:
+                segments.append(segment.size / SAMPLE_RATE)
+        results[str(level)] = {"utterances": len(segments), "speech_seconds": float(sum(segments))}
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta=0.005):
+    """Return a list of p95 regressions of `results` against `baseline`."""
+    regressions = []
+    for model, buckets in results["summary"].items():
+        for bucket, stages in buckets.items():
+            for stage, stats in stages.items():
+                old = baseline.get("summary", {}).get(model, {}).get(bucket, {}).get(stage)
+                if old is None:
+                    continue
+                if stats["p95"] > old["p95"] * (1 + tolerance) and stats["p95"] - old["p95"] > min_delta:
+                    regressions.append(f"{model}/{bucket}/{stage}: p95 {old['p95'] * 1000:.1f} ms -> "
+                                       f"{stats['p95'] * 1000:.1f} ms")
+    for level, stats in results.get("noise", {}).items():
+        old = baseline.get("noise", {}).get(level)
+        # Any extra second of noise taken for speech is a regression, whatever the tolerance
+        if old is not None and stats["speech_seconds"] > old["speech_seconds"] + 1.0:
+            regressions.append(f"noise/{level}: {old['speech_seconds']:.1f} s -> {stats['speech_seconds']:.1f} s "
+                               f"taken for speech")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["tiny.en", "base.en"], help="Whisper model sizes")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="Directory of WAV fixtures")
+    parser.add_argument("--repeats", type=int, default=3, help="Turns per fixture and model")
+    parser.add_argument("--llm-first-token-ms", type=float, default=150.0, help="Stub LLM time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=10.0, help="Stub LLM delay per generated word")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier results JSON to check for p95 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative p95 increase")
+    args = parser.parse_args(argv)
+
+    stub = StubLLMServer(first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms).start()
+    # The engine is created lazily, so these take effect before the first LLM call
+    os.environ["GROQ_API_BASE"] = stub.base_url
+    os.environ["GROQ_API_KEY"] = "stub"
+
+    if not glob.glob(os.path.join(args.fixtures, "*.wav")):
+        make_fixtures(args.fixtures)
+    fixtures = load_fixtures(args.fixtures)
+
+    backend, sink = offline_tts_backend(), TimingSink()
+    set_speech_pipeline(SpeechPipeline(backend=backend, sink=sink, cache=None))
+
+    samples_by_model = {}
+    transcripts = {}
+    for size in args.models:
+        model = load_whisper(size=size, device="cpu")
+        samples_by_model[size] = {}
+        for name, samples, _ in fixtures:
+            bucket = length_bucket(samples.size / SAMPLE_RATE)
+            for _ in range(args.repeats):
+                timings, text = run_turn(model, samples, sink)
+                transcripts[f"{size}/{name}"] = text.strip()
+                for target in (bucket, "all"):
+                    for stage, value in timings.items():
+                        samples_by_model[size].setdefault(target, {}).setdefault(stage, []).append(value)
+            print(f"{size:>10} {name:<16} {timings['response_latency'] * 1000:8.1f} ms  {text.strip()!r}")
+
+    stub.stop()
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "tts_backend": backend.name,
+        "repeats": args.repeats,
+        "models": model_manager.stats(),
+        "summary": {size: {bucket: {stage: summarize(v) for stage, v in stages.items()}
+                           for bucket, stages in buckets.items()}
+                    for size, buckets in samples_by_model.items()},
+        "transcripts": transcripts,
+        "noise": noise_endpointing(),
+    }
+
+    print(f"\n{'model':>10} {'bucket':<7} {'stage':<17} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for size, buckets in results["summary"].items():
+        for bucket, stages in buckets.items():
+            for stage in STAGES:
+                stats = stages[stage]
+                print(f"{size:>10} {bucket:<7} {stage:<17} {stats['p50'] * 1000:9.1f} "
+                      f"{stats['p95'] * 1000:9.1f} {stats['p99'] * 1000:9.1f}")
+
+    print(f"\n{'noise rms':>10} {'utterances':>10} {'speech s':>9}")
+    for level, stats in results["noise"].items():
+        print(f"{level:>10} {stats['utterances']:>10} {stats['speech_seconds']:9.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,95 +1,143 @@
+import json
+import uuid
 import uvicorn
+from typing import Optional
 from pydantic import BaseModel
-from utils import get_response_llm
-from fastapi import FastAPI, HTTPException
-from langchain.memory import ConversationBufferMemory
+from utils import aget_response_llm, astream_response_llm, get_speech_pipeline
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from src.logger import logger
+from src.metrics import render_metrics, turn_context
+from src.session_store import create_session_store
+from src.audio import MAX_SAMPLE_RATE, MIN_SAMPLE_RATE, SAMPLE_RATE, UPLOAD_CONTENT_TYPES, decode_audio_upload
+from src.batch_transcriber import get_transcriber
+from src.scheduler import Overloaded, RateLimited
+from src.voice_session import SessionSlots, VoiceSession
 
 app = FastAPI()
 
-# In-memory conversation history
-memory = ConversationBufferMemory(memory_key="chat_history")
+# Conversation history per session (SESSION_STORE=sqlite shares it across workers)
+store = create_session_store()
+
+# Concurrent /ws/voice calls per process (VOICE_MAX_SESSIONS)
+voice_slots = SessionSlots()
 
 class Message(BaseModel):
     message: str
+    session_id: Optional[str] = None
+
+def get_session_id(message: Message, x_session_id: Optional[str]):
+    return message.session_id or x_session_id or uuid.uuid4().hex
+
+def overloaded_error(error: Overloaded):
+    """429 when a rate limit is the cause, 503 when the server is simply too busy; both ask the client to retry."""
+    status_code = 429 if isinstance(error, RateLimited) else 503
+    return HTTPException(status_code=status_code, detail=str(error),
+                         headers={"Retry-After": str(max(1, round(error.retry_after)))})
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
 @app.post("/chat")
-async def chat(message: Message):
+async def chat(message: Message, x_session_id: Optional[str] = Header(default=None),
+               x_turn_id: Optional[str] = Header(default=None)):
     try:
+        session_id = get_session_id(message, x_session_id)
         user_question = message.message
-        response_llm = get_response_llm(user_question=user_question, memory=memory)
-        return {"response": response_llm}
+        with turn_context(session_id, x_turn_id):
+            memory = await run_in_threadpool(store.load, session_id)
+            response_llm = await aget_response_llm(user_question=user_question, memory=memory)
+            await run_in_threadpool(store.save, session_id, memory)
+        return {"response": response_llm, "session_id": session_id}
+    except Overloaded as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat/stream")
+async def chat_stream(message: Message, x_session_id: Optional[str] = Header(default=None),
+                      x_turn_id: Optional[str] = Header(default=None)):
+    """
+    Stream the response as Server-Sent Events.
+
+    Each token arrives as a `data: {"token": ...}` event; the stream ends with a `done`
+    event carrying the session id, or an `error` event if the LLM call failed.
+    """
+    session_id = get_session_id(message, x_session_id)
+    memory = await run_in_threadpool(store.load, session_id)
+
+    async def events():
+        try:
+            with turn_context(session_id, x_turn_id):
+                async for token in astream_response_llm(user_question=message.message, memory=memory):
+                    yield sse_event({"token": token})
+                await run_in_threadpool(store.save, session_id, memory)
+            yield sse_event({"session_id": session_id}, event="done")
+        except Overloaded as e:
+            logger.warning("Streaming chat turned away for session %s: %s", session_id, e)
+            yield sse_event({"detail": str(e), "retry_after": e.retry_after}, event="error")
+        except Exception as e:
+            logger.error("Streaming chat failed for session %s: %s", session_id, e)
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Session-ID": session_id})
+
+@app.post("/transcribe")
+async def transcribe(request: Request,
+                     sample_rate: int = Query(SAMPLE_RATE, ge=MIN_SAMPLE_RATE, le=MAX_SAMPLE_RATE)):
+    """
+    Transcribe an uploaded WAV file, or raw 16-bit mono PCM sent as the request body.
+
+    The file is the body itself, not a multipart form; other content types are rejected.
+    Concurrent requests are grouped into batched Whisper decodes on a shared model;
+    see TRANSCRIBE_MAX_BATCH, TRANSCRIBE_MAX_WAIT_MS and TRANSCRIBE_WORKERS.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type and content_type not in UPLOAD_CONTENT_TYPES:
+        raise HTTPException(status_code=400,
+                            detail=f"Unsupported content type {content_type!r}, send the WAV or PCM audio as "
+                                   f"the request body ({', '.join(UPLOAD_CONTENT_TYPES)})")
+    try:
+        audio = decode_audio_upload(await request.body(), sample_rate=sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        transcriber = await run_in_threadpool(get_transcriber)
+        text = await transcriber.transcribe(audio)
+        return {"transcription": text}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.websocket("/ws/voice")
+async def voice(websocket: WebSocket, session_id: Optional[str] = None,
+                sample_rate: int = Query(SAMPLE_RATE, ge=MIN_SAMPLE_RATE, le=MAX_SAMPLE_RATE)):
+    """
+    Full-duplex voice call: 16-bit mono PCM in, transcript events and synthesized speech out.
+
+    See `VoiceSession` for the message protocol. Calls above VOICE_MAX_SESSIONS are closed
+    with code 1013 (try again later).
+    """
+    await websocket.accept()
+    if not voice_slots.try_acquire():
+        await websocket.close(code=1013, reason="Too many voice sessions")
+        return
+    try:
+        transcriber = await run_in_threadpool(get_transcriber)
+        session = VoiceSession(websocket, store, session_id or uuid.uuid4().hex, transcriber, get_speech_pipeline(),
+                               sample_rate=sample_rate)
+        await session.run()
+    finally:
+        voice_slots.release()
+
+@app.get("/metrics")
+def metrics(request: Request):
+    """Prometheus metrics: per-stage latency histograms, queue depths and in-flight LLM calls."""
+    data, content_type = render_metrics(request.headers.get("accept"))
+    return Response(content=data, media_type=content_type)
     
 if __name__ ==  "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
-
-
-
-
-
-
-# from fastapi import FastAPI, File, UploadFile
-# from fastapi.responses import JSONResponse
-# import uvicorn
-# from pydantic import BaseModel
-# from typing import Optional
-# from utils import load_whisper, transcribe_audio, get_response_llm, play_text_to_speech, record_audio_chunk
-# from langchain.memory import ConversationBufferMemory
-# import os
-# import pyaudio
-# import wave
-# import time
-
-# app = FastAPI()
-
-# chunk_file = 'temp_audio_chunk.wav'
-# model = load_whisper()
-# memory = ConversationBufferMemory(memory_key="chat_history")
-
-# class AudioRequest(BaseModel):
-#     user_question: Optional[str] = None
-#     chat_history: Optional[str] = None
-
-# @app.post("/record-audio/")
-# async def record_audio():
-#     audio = pyaudio.PyAudio()
-#     stream = audio.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=1024)
-
-#     try:
-#         record_audio_chunk(audio, stream)
-#     finally:
-#         stream.stop_stream()
-#         stream.close()
-#         audio.terminate()
-
-#     return {"message": "Audio recorded successfully"}
-
-# @app.post("/transcribe-audio/")
-# async def transcribe_audio_endpoint(file: UploadFile = File(...)):
-#     try:
-#         with open(chunk_file, "wb") as buffer:
-#             buffer.write(file.file.read())
-
-#         text = transcribe_audio(model, chunk_file)
-
-#         if text is not None:
-#             return {"transcription": text}
-#         else:
-#             return JSONResponse(status_code=400, content={"message": "Failed to transcribe audio"})
-#     finally:
-#         time.sleep(1)  # Add a delay before attempting to delete the file
-#         if os.path.exists(chunk_file):
-#             try:
-#                 os.remove(chunk_file)
-#             except PermissionError:
-#                 pass  # Handle the exception if needed
-
-# @app.post("/get-response/")
-# async def get_response(data: AudioRequest):
-#     response_llm = get_response_llm(user_question=data.user_question, memory=memory)
-#     play_text_to_speech(response_llm)
-#     return {"response": response_llm}
-
-# if __name__ == "__main__":
-#     uvicorn.run(app, host="0.0.0.0", port=8000)
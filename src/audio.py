@@ -0,0 +1,128 @@
+import io
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000     # Whisper expects 16 kHz mono audio
+MIN_SAMPLE_RATE = 8000  # Range of client sample rates that are resampled
+MAX_SAMPLE_RATE = 48000
+
+# Content types `decode_audio_upload` understands; an upload without one is taken as-is
+UPLOAD_CONTENT_TYPES = ("audio/wav", "audio/wave", "audio/x-wav", "audio/vnd.wave", "audio/l16", "audio/pcm",
+                        "application/octet-stream")
+
+
+def pcm_to_int16(data):
+    """Interpret raw little-endian 16-bit PCM bytes as int16 samples, dropping a trailing odd byte."""
+    return np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+
+
+def pcm_to_float32(data):
+    """
+    Convert 16-bit PCM audio to the float32 format Whisper works with.
+
+    Args:
+        data (bytes or np.ndarray): Raw little-endian int16 PCM bytes or an int16 array.
+
+    Returns:
+        np.ndarray: float32 samples normalized to the range [-1.0, 1.0).
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = pcm_to_int16(data)
+    return data.astype(np.float32) / 32768.0
+
+
+def write_wav(file_path, samples, sample_rate=SAMPLE_RATE):
+    """
+    Write int16 mono samples to a WAV file.
+
+    Args:
+        file_path (str): Destination path.
+        samples (np.ndarray): int16 samples.
+        sample_rate (int): Sample rate in Hertz.
+    """
+    with wave.open(file_path, 'wb') as wf:
+        wf.setnchannels(1)  # Mono channel
+        wf.setsampwidth(2)  # 16-bit samples
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+
+
+def to_wav_bytes(samples, sample_rate=SAMPLE_RATE):
+    """
+    Encode int16 mono samples as an in-memory WAV file.
+
+    Returns:
+        bytes: The WAV file contents.
+    """
+    fp = io.BytesIO()
+    with wave.open(fp, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+    return fp.getvalue()
+
+
+def read_wav_bytes(data):
+    """
+    Decode an in-memory 16-bit PCM WAV file, mixing it down to mono.
+
+    Args:
+        data (bytes): The WAV file contents.
+
+    Returns:
+        tuple: (int16 samples, sample rate)
+    """
+    with wave.open(io.BytesIO(data), 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit PCM WAV is supported, got {8 * wf.getsampwidth()}-bit")
+        channels = wf.getnchannels()
+        sample_rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+def resample(samples, source_rate, target_rate):
+    """
+    Resample audio with linear interpolation.
+
+    Good enough for speech playback and for feeding Whisper, which only looks at 0-8 kHz.
+    """
+    if source_rate == target_rate or samples.size == 0:
+        return samples
+    duration = samples.size / source_rate
+    target_times = np.arange(int(round(duration * target_rate))) / target_rate
+    source_times = np.arange(samples.size) / source_rate
+    resampled = np.interp(target_times, source_times, samples.astype(np.float32))
+    return resampled.astype(samples.dtype)
+
+
+def decode_audio_upload(data, sample_rate=SAMPLE_RATE):
+    """
+    Decode uploaded audio for Whisper.
+
+    Args:
+        data (bytes): A 16-bit PCM WAV file, or raw little-endian int16 mono PCM.
+        sample_rate (int): Sample rate of raw PCM uploads (ignored for WAV, which carries its own).
+
+    Returns:
+        np.ndarray: float32 mono samples at 16 kHz.
+
+    Raises:
+        ValueError: If the upload is empty or not a supported format.
+    """
+    if not data:
+        raise ValueError("Empty audio upload")
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            samples, sample_rate = read_wav_bytes(data)
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"Invalid WAV file: {e}") from e
+    else:
+        samples = pcm_to_int16(data)
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f"Unsupported sample rate {sample_rate} Hz, expected {MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE} Hz")
+    return pcm_to_float32(resample(samples, sample_rate, SAMPLE_RATE))
@@ -0,0 +1,130 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pyaudio  # To play & record audio
+
+from src.audio import resample
+from src.tts_backends import TTS_SAMPLE_RATE
+
+
+class AudioSink:
+    """
+    Persistent audio output that plays int16 PCM buffers from memory.
+
+    The output stream is opened once and kept running in PyAudio callback mode. Buffers
+    passed to `play` are queued and played back to back; each returns a threading.Event
+    that is set when the last of its samples has been handed to the device, so callers
+    can wait for completion without polling.
+    """
+
+    def __init__(self, sample_rate=TTS_SAMPLE_RATE, frames_per_buffer=512):
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self._queue = deque()       # (samples, done event)
+        self._position = 0          # Samples of the head buffer already played
+        self.level = 0.0            # Recent RMS of the output (int16 units), decaying over ~100 ms
+        self._lock = threading.Lock()
+        self._audio = None
+        self._stream = None
+
+    def _ensure_open(self):
+        if self._stream is None:
+            self._audio = pyaudio.PyAudio()
+            self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.sample_rate,
+                                            output=True, frames_per_buffer=self.frames_per_buffer,
+                                            stream_callback=self._callback)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        out = np.zeros(frame_count, dtype=np.int16)
+        filled = 0
+        with self._lock:
+            while filled < frame_count and self._queue:
+                samples, done = self._queue[0]
+                n = min(frame_count - filled, samples.size - self._position)
+                out[filled:filled + n] = samples[self._position:self._position + n]
+                filled += n
+                self._position += n
+                if self._position >= samples.size:
+                    self._queue.popleft()
+                    self._position = 0
+                    done.set()
+        rms = float(np.sqrt(np.mean(out.astype(np.float32) ** 2)))
+        level = max(rms, self.level * 0.8)
+        # Snap to silence instead of decaying forever, so the echo gate opens once playback ends
+        self.level = level if level >= 1.0 else 0.0
+        # Keep the stream running with silence when idle, so the next reply starts instantly
+        return out.tobytes(), pyaudio.paContinue
+
+    def play(self, samples, sample_rate=None):
+        """
+        Queue int16 mono samples for playback.
+
+        Args:
+            samples (np.ndarray): int16 samples.
+            sample_rate (int, optional): Rate of the samples; resampled if it differs from the sink.
+
+        Returns:
+            threading.Event: Set once the buffer has finished playing.
+        """
+        self._ensure_open()
+        samples = resample(samples, sample_rate or self.sample_rate, self.sample_rate)
+        done = threading.Event()
+        if samples.size == 0:
+            done.set()
+            return done
+        with self._lock:
+            self._queue.append((samples, done))
+        return done
+
+    def stop(self):
+        """Drop everything that is queued or playing and release its waiters."""
+        with self._lock:
+            for _, done in self._queue:
+                done.set()
+            self._queue.clear()
+            self._position = 0
+
+    @property
+    def busy(self):
+        return bool(self._queue)
+
+    def close(self):
+        """Stop playback and close the output stream."""
+        self.stop()
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._audio.terminate()
+            self._stream = None
+            self._audio = None
+
+
+class NullSink:
+    """
+    Audio sink that discards everything, for headless servers and benchmarks.
+
+    Buffers count as played as soon as they are queued.
+    """
+
+    level = 0.0
+
+    def __init__(self, sample_rate=TTS_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.played_samples = 0
+
+    def play(self, samples, sample_rate=None):
+        self.played_samples += samples.size
+        done = threading.Event()
+        done.set()
+        return done
+
+    def stop(self):
+        pass
+
+    @property
+    def busy(self):
+        return False
+
+    def close(self):
+        pass
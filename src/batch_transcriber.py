@@ -0,0 +1,154 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import torch
+import whisper
+
+from src.logger import logger
+from src.metrics import MeteredQueue, span
+from src.model_manager import model_manager
+from src.preprocess import AUDIO_PREPROCESS, preprocess
+
+TRANSCRIBE_MAX_BATCH = int(os.getenv("TRANSCRIBE_MAX_BATCH", "8"))
+TRANSCRIBE_MAX_WAIT_MS = float(os.getenv("TRANSCRIBE_MAX_WAIT_MS", "10"))
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+
+# Whisper decodes at most 30 seconds at a time; longer uploads go through model.transcribe
+_MAX_BATCH_SAMPLES = whisper.audio.N_SAMPLES
+
+
+class BatchTranscriber:
+    """
+    Groups concurrent transcription requests into batched Whisper decodes.
+
+    A dispatcher thread waits until a decode worker is free, then collects every request
+    that arrives within `max_wait_ms` (up to `max_batch`) and decodes them as one batch.
+    Under load, requests queue up while the workers are busy, so batches grow on their own;
+    one model copy serves all sessions. Decodes on that model run one at a time, so extra
+    workers only overlap preprocessing and feature extraction with the running decode.
+    """
+
+    def __init__(self, model=None, max_batch=TRANSCRIBE_MAX_BATCH, max_wait_ms=TRANSCRIBE_MAX_WAIT_MS,
+                 workers=TRANSCRIBE_WORKERS, clean=AUDIO_PREPROCESS):
+        self.model = model or model_manager.get()
+        self.clean = clean
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._requests = MeteredQueue("transcribe_requests")
+        self._free_workers = threading.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr-batch")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="asr-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, audio):
+        """
+        Queue float32 16 kHz audio for transcription.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the transcribed text.
+        """
+        future = Future()
+        self._requests.put((audio, future))
+        return future
+
+    async def transcribe(self, audio):
+        """Transcribe audio from inside an event loop without blocking it."""
+        # Includes time spent waiting for a batch, which is what the caller experiences
+        with span("transcription"):
+            return await asyncio.wrap_future(self.submit(audio))
+
+    def _dispatch(self):
+        while True:
+            self._free_workers.acquire()
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait())
+                except queue.Empty:
+                    break
+            job = self._executor.submit(self._run, batch)
+            job.add_done_callback(lambda _: self._free_workers.release())
+
+    def _run(self, batch):
+        batch = [(audio, future) for audio, future in batch if future.set_running_or_notify_cancel()]
+        try:
+            self._transcribe(batch)
+        except Exception as e:
+            # Nothing else will ever resolve these futures, so fail whatever is left of the batch
+            logger.exception("Transcription batch failed: %s", e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _transcribe(self, batch):
+        if self.clean:
+            cleaned = []
+            for audio, future in batch:
+                audio = preprocess(audio).audio
+                if audio.size:
+                    cleaned.append((audio, future))
+                else:
+                    future.set_result("")
+            batch = cleaned
+        short = [(audio, future) for audio, future in batch if audio.size <= _MAX_BATCH_SAMPLES]
+        long = [(audio, future) for audio, future in batch if audio.size > _MAX_BATCH_SAMPLES]
+
+        if short:
+            start = time.perf_counter()
+            try:
+                texts = self.decode_batch([audio for audio, _ in short])
+            except Exception as e:
+                for _, future in short:
+                    future.set_exception(e)
+            else:
+                for (_, future), text in zip(short, texts):
+                    future.set_result(text)
+            logger.info("Decoded a batch of %d in %.3fs", len(short), time.perf_counter() - start)
+
+        for audio, future in long:
+            try:
+                options = model_manager.transcribe_options(self.model)
+                with model_manager.lock(self.model):
+                    text = self.model.transcribe(audio, **options)["text"]
+                future.set_result(text)
+            except Exception as e:
+                future.set_exception(e)
+
+    def decode_batch(self, audios):
+        """
+        Decode up to 30 seconds of audio per item in a single batched forward pass.
+
+        Args:
+            audios (list[np.ndarray]): float32 16 kHz samples.
+
+        Returns:
+            list[str]: One transcript per input, empty where Whisper detected no speech.
+        """
+        n_mels = self.model.dims.n_mels
+        mels = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels)
+                            for audio in audios]).to(self.model.device)
+        options = whisper.DecodingOptions(without_timestamps=True, **model_manager.decode_options(self.model))
+        with model_manager.lock(self.model):
+            results = whisper.decode(self.model, mels, options)
+        # Same no-speech rule as model.transcribe, so silence does not turn into hallucinated words
+        return ["" if r.no_speech_prob > 0.6 and r.avg_logprob < -1.0 else r.text.strip() for r in results]
+
+
+_transcriber = None
+_transcriber_lock = threading.Lock()
+
+
+def get_transcriber():
+    """Return the process-wide BatchTranscriber, loading the model on first use."""
+    global _transcriber
+    if _transcriber is None:
+        with _transcriber_lock:
+            if _transcriber is None:
+                _transcriber = BatchTranscriber()
+    return _transcriber
@@ -0,0 +1,196 @@
+import os
+import time
+import threading
+from queue import Empty
+
+import numpy as np
+import pyaudio  # To play & record audio
+
+from src.audio import SAMPLE_RATE, pcm_to_float32
+from src.endpointer import Endpointer
+from src.logger import logger
+from src.metrics import MeteredQueue, observe
+
+BARGE_IN = os.getenv("BARGE_IN", "1") == "1"
+BARGE_IN_ECHO_GATE = os.getenv("BARGE_IN_ECHO_GATE", "1") == "1"
+BARGE_IN_ECHO_RATIO = float(os.getenv("BARGE_IN_ECHO_RATIO", "0.5"))   # Expected echo level / playback level
+
+
+class RingBuffer:
+    """
+    Preallocated single-producer, single-consumer ring buffer of int16 samples.
+
+    The writer never blocks: if the reader falls more than `capacity` samples behind,
+    the oldest audio is overwritten and counted in `dropped`.
+    """
+
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self._write = 0     # Total samples written
+        self._read = 0      # Total samples read
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def write(self, samples):
+        n = samples.size
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.dropped += n - self.capacity
+            n = self.capacity
+        with self._cond:
+            start = self._write % self.capacity
+            first = min(n, self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:n - first] = samples[first:]
+            self._write += n
+            overrun = self._write - self._read - self.capacity
+            if overrun > 0:
+                self._read += overrun
+                self.dropped += overrun
+            self._cond.notify()
+
+    def read(self, n, timeout=None):
+        """
+        Block until `n` samples are available and return a copy of them.
+
+        Returns:
+            np.ndarray or None: The samples, or None if the buffer was closed or the timeout expired.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.closed or self._write - self._read >= n, timeout):
+                return None
+            if self.closed:
+                return None
+            start = self._read % self.capacity
+            first = min(n, self.capacity - start)
+            out = np.concatenate([self._data[start:start + first], self._data[:n - first]])
+            self._read += n
+            return out
+
+    @property
+    def available(self):
+        return self._write - self._read
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class AudioCapture:
+    """
+    Long-lived microphone capture that keeps recording while the rest of the turn runs.
+
+    PyAudio delivers audio in callback mode into a preallocated ring buffer. A segmenter
+    thread feeds the buffered frames to an endpointer and puts each finished utterance
+    (float32, 16 kHz) on the `utterances` queue. Speech that starts while an earlier reply
+    is still being transcribed, generated or played is therefore never lost.
+
+    Callables in `on_speech_start` run on the segmenter thread as soon as an utterance
+    starts. If `echo_reference` is set to the audio sink, the endpointer ignores frames
+    quieter than `echo_ratio` times what the sink is playing.
+    """
+
+    def __init__(self, endpointer=None, buffer_seconds=30, frames_per_buffer=1024, input_device_index=None):
+        self.endpointer = endpointer or Endpointer()
+        self.frames_per_buffer = frames_per_buffer
+        self.input_device_index = input_device_index
+        self.on_speech_start = []
+        self.echo_reference = None
+        self.echo_ratio = BARGE_IN_ECHO_RATIO
+        self.ring = RingBuffer(int(SAMPLE_RATE * buffer_seconds))
+        self.utterances = MeteredQueue("utterances")
+        self._audio = None
+        self._stream = None
+        self._segmenter = None
+
+    def start(self):
+        """Open the input stream and start segmenting."""
+        if self._stream is not None:
+            return self
+        self._audio = pyaudio.PyAudio()
+        try:
+            self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, input=True,
+                                            frames_per_buffer=self.frames_per_buffer,
+                                            input_device_index=self.input_device_index,
+                                            stream_callback=self._callback)
+        except Exception:
+            self._audio.terminate()
+            self._audio = None
+            raise
+        self._segmenter = threading.Thread(target=self._segment, name="audio-segmenter", daemon=True)
+        self._segmenter.start()
+        return self
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        return None, pyaudio.paContinue
+
+    def _segment(self):
+        frame_length = self.endpointer.frame_length
+        endpointing = 0.0     # Time spent in the endpointer for the utterance in progress
+        onset = None          # When the utterance in progress started
+        while True:
+            frame = self.ring.read(frame_length)
+            if frame is None:
+                break
+            start = time.perf_counter()
+            if self.echo_reference is not None:
+                self.endpointer.gate = self.echo_ratio * self.echo_reference.level
+            triggered = self.endpointer.triggered
+            segment = self.endpointer.process(frame)
+            endpointing += time.perf_counter() - start
+            if self.endpointer.triggered and not triggered:
+                onset = start
+                for callback in self.on_speech_start:
+                    try:
+                        callback()
+                    except Exception as e:
+                        logger.error("Speech start callback failed: %s", e)
+            if segment is not None:
+                # From the first frame of speech until the endpointer closed the utterance
+                observe("capture", time.perf_counter() - (onset or start))
+                observe("silence_check", endpointing)
+                endpointing = 0.0
+                onset = None
+                self.utterances.put(pcm_to_float32(segment))
+        if self.ring.dropped:
+            logger.warning("Audio capture dropped %d samples", self.ring.dropped)
+
+    @property
+    def in_speech(self):
+        """True while an utterance is being recorded or is waiting in the queue."""
+        return self.endpointer.triggered or not self.utterances.empty()
+
+    def get_utterance(self, timeout=None):
+        """
+        Return the next utterance, waiting up to `timeout` seconds.
+
+        Returns:
+            np.ndarray or None: float32 samples, or None if nothing was said in time.
+        """
+        try:
+            return self.utterances.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def close(self):
+        """Stop capturing and release the audio device."""
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._audio.terminate()
+            self._stream = None
+            self._audio = None
+        self.ring.close()
+        if self._segmenter is not None:
+            self._segmenter.join(timeout=1)
+            self._segmenter = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,176 @@
+from collections import deque
+
+import numpy as np
+
+
+class Endpointer:
+    """
+    Streaming voice-activity endpointer working frame by frame on int16 audio.
+
+    Each frame is classified as speech or non-speech from its RMS energy and its
+    zero-crossing rate (ZCR). Low-energy frames with a high ZCR are still counted as
+    speech so that unvoiced sounds ("s", "f", "th") do not end an utterance early.
+    The energy threshold follows an adaptive noise floor. The first `calibration_ms` of audio
+    only measure the background, so a room that is already loud does not count as speech
+    from the first frame. After that the floor falls with the non-speech frames and rises to
+    the quietest frame of the last `noise_window_ms`, speech included: speech always has
+    quieter gaps, while steady noise does not, so noise that starts mid-call stops counting
+    as speech within that window instead of running to `max_utterance_s`.
+
+    An utterance starts after `start_ms` of consecutive speech and ends after
+    `end_silence_ms` of trailing non-speech. A pre-roll ring buffer keeps the audio
+    just before the onset so the first phoneme is not clipped, and only `hangover_ms`
+    of the trailing silence is kept in the returned segment. After `speculate_ms` of
+    trailing silence, `likely_ended` turns True so callers can start work on the
+    utterance before it is closed.
+
+    While the assistant is speaking, `gate` can be set to the RMS its own voice is expected
+    to reach in the microphone; quieter frames are then never speech, so the reply does not
+    trigger an utterance of its own. They do not move the noise floor either, while louder
+    non-speech frames still do.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, energy_threshold=400.0, zcr_threshold=0.25,
+                 unvoiced_ratio=0.5, noise_ratio=3.0, start_ms=90, end_silence_ms=300, hangover_ms=150,
+                 pre_roll_ms=300, max_utterance_s=15, speculate_ms=150, calibration_ms=300, noise_window_ms=1500):
+        """
+        Args:
+            sample_rate (int): Sample rate of the incoming audio in Hertz.
+            frame_ms (int): Length of one analysis frame in milliseconds.
+            energy_threshold (float): Minimum RMS (in int16 units) for a frame to count as voiced speech.
+            zcr_threshold (float): Zero-crossing rate above which a quieter frame counts as unvoiced speech.
+            unvoiced_ratio (float): Fraction of the energy threshold an unvoiced frame must reach.
+            noise_ratio (float): How far above the estimated noise floor speech must be.
+            start_ms (int): Consecutive speech needed to start an utterance.
+            end_silence_ms (int): Trailing silence that ends an utterance.
+            hangover_ms (int): Trailing silence kept at the end of the returned segment.
+            pre_roll_ms (int): Audio kept from before the detected onset.
+            max_utterance_s (float): Hard cap on the length of one utterance.
+            speculate_ms (int): Trailing silence after which the utterance has probably ended.
+            calibration_ms (int): Initial audio used only to measure the background level.
+            noise_window_ms (int): Window whose quietest frame the noise floor rises to.
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.energy_threshold = energy_threshold
+        self.zcr_threshold = zcr_threshold
+        self.unvoiced_ratio = unvoiced_ratio
+        self.noise_ratio = noise_ratio
+
+        self.start_frames = max(1, round(start_ms / frame_ms))
+        self.end_frames = max(1, round(end_silence_ms / frame_ms))
+        self.hangover_frames = min(round(hangover_ms / frame_ms), self.end_frames)
+        self.speculate_frames = min(max(1, round(speculate_ms / frame_ms)), self.end_frames)
+        self.max_samples = int(max_utterance_s * sample_rate)
+
+        self._pre_roll = deque(maxlen=max(1, round(pre_roll_ms / frame_ms)))
+        self.noise_floor = 0.0
+        self._calibration_frames = round(calibration_ms / frame_ms)
+        self._recent = deque(maxlen=max(1, round(noise_window_ms / frame_ms)))    # RMS of recent frames
+        self.gate = 0.0         # Echo gate, in int16 RMS units; 0 when nothing is playing
+        self.reset()
+
+    def reset(self):
+        """Drop any buffered audio and wait for the next utterance."""
+        self._pre_roll.clear()
+        self._speech = []
+        self._trailing = []
+        self._speech_run = 0
+        self._num_samples = 0
+        self.triggered = False
+
+    @staticmethod
+    def frame_features(frame):
+        """Return the RMS energy and zero-crossing rate of an int16 frame."""
+        samples = frame.astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        signs = np.signbit(frame)
+        zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / max(1, frame.size - 1)
+        return rms, zcr
+
+    def is_speech(self, frame):
+        """Classify a single frame as speech (True) or non-speech (False)."""
+        rms, zcr = self.frame_features(frame)
+        if rms < self.gate:
+            # Possibly the echo of our own playback: not speech, and not background noise either
+            return False
+        self._recent.append(rms)
+        if self._calibration_frames or len(self._recent) == self._recent.maxlen:
+            # The quietest recent frame is background, even in the middle of an utterance
+            self.noise_floor = max(self.noise_floor, min(self._recent))
+        if self._calibration_frames:
+            self._calibration_frames -= 1
+            return False
+        threshold = max(self.energy_threshold, self.noise_floor * self.noise_ratio)
+        speech = rms >= threshold or (rms >= threshold * self.unvoiced_ratio and zcr >= self.zcr_threshold)
+        if not speech:
+            # Track the background level slowly so a loud room raises the threshold
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return speech
+
+    def process(self, frame):
+        """
+        Feed one frame of int16 audio to the endpointer.
+
+        Args:
+            frame (np.ndarray): int16 samples, normally `frame_length` long.
+
+        Returns:
+            np.ndarray or None: The int16 speech segment once an utterance has ended, otherwise None.
+        """
+        speech = self.is_speech(frame)
+
+        if not self.triggered:
+            self._pre_roll.append(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                # Onset confirmed: the pre-roll already holds the onset frames themselves
+                self.triggered = True
+                self._speech = list(self._pre_roll)
+                self._num_samples = sum(f.size for f in self._speech)
+                self._pre_roll.clear()
+            return None
+
+        self._num_samples += frame.size
+        if speech:
+            self._speech.extend(self._trailing)
+            self._speech.append(frame)
+            self._trailing = []
+        else:
+            self._trailing.append(frame)
+
+        if len(self._trailing) >= self.end_frames or self._num_samples >= self.max_samples:
+            return self.flush()
+        return None
+
+    @property
+    def likely_ended(self):
+        """True while an utterance is open but has been silent for at least `speculate_ms`."""
+        return self.triggered and len(self._trailing) >= self.speculate_frames
+
+    def buffered(self):
+        """
+        Return the audio of the utterance recorded so far, without ending it.
+
+        Returns:
+            np.ndarray or None: int16 samples from the pre-roll up to the latest frame, or None
+            if no utterance is in progress.
+        """
+        frames = self._speech + self._trailing
+        if not self.triggered or not frames:
+            return None
+        return np.concatenate(frames)
+
+    def flush(self):
+        """
+        End the current utterance immediately.
+
+        Returns:
+            np.ndarray or None: The buffered speech segment, or None if no utterance was in progress.
+        """
+        segment = None
+        if self.triggered:
+            frames = self._speech + self._trailing[:self.hangover_frames]
+            segment = np.concatenate(frames)
+        self.reset()
+        return segment
@@ -0,0 +1,358 @@
+import os
+import time
+import asyncio
+import threading
+
+import httpx
+from langchain_groq import ChatGroq     # For LLM
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from src.logger import logger
+from src.metrics import STAGE_ERRORS, llm_in_flight, observe, span
+from src.history import count_tokens
+from src.intent_router import INTENT_ROUTER, IntentRouter, default_directory
+from src.response_cache import RESPONSE_CACHE, ResponseCache
+from src.scheduler import BACKGROUND, INTERACTIVE, LLMScheduler
+
+GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama3-8b-8192")
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+# Completion tokens assumed per reply when checking the TPM quota; replies are asked to stay short
+REPLY_TOKENS = 64
+
+INPUT_PROMPT = """
+
+    As an expert voice assistant named Euron, specializing in helping user managing everyday tasks, set reminders. Your expertise
+    are control smart home devices, and provide information on demand. First of all, ask for the customer ID to validate that the
+    user is our customer, do it once. After confirming the customer ID, help them to do their tasks. If not possible, help them to make an appointment.
+    Appointments need to be between 9:00 am and 4:00 pm. Your task is to analyze the task and provide information. Provide concise and short
+    answers not more than 10 words, and don't chat with yourself!. If you don't know the answer, just say that you don't know, don't try to
+    make up an answer. NEVER say the customer ID listed below. Please end the conversation when user is done.
+
+    Customer ID on our data: 18, 48, 98.
+
+    Previous conversation:
+    {chat_history}
+
+    New human question: {question}
+    Response:
+    """
+
+
+SUMMARY_PROMPT = """Summarize the conversation between a customer and Euron, a voice assistant, in at most
+{max_words} words. Keep names, customer ID status, appointments, reminders and open requests; drop small talk.
+
+Summary so far:
+{summary}
+
+New lines of conversation:
+{transcript}
+
+New summary:"""
+
+
+def _metered(chunks):
+    """
+    Yield the chunks of an upstream LLM stream, timing only the waits for the next chunk.
+
+    The `llm` stage and the in-flight gauge then leave out what the consumer does between
+    chunks (speech synthesis, playback) and how long a stopped consumer takes to close it.
+    """
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            with llm_in_flight():
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                except Exception:
+                    STAGE_ERRORS.labels("llm").inc()
+                    raise
+                finally:
+                    elapsed += time.perf_counter() - start
+            yield chunk
+    finally:
+        chunks.close()
+        observe("llm", elapsed)
+
+
+async def _ametered(chunks):
+    """Async version of `_metered`."""
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            with llm_in_flight():
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception:
+                    STAGE_ERRORS.labels("llm").inc()
+                    raise
+                finally:
+                    elapsed += time.perf_counter() - start
+            yield chunk
+    finally:
+        await chunks.aclose()
+        observe("llm", elapsed)
+
+
+class AssistantEngine:
+    """
+    Long-lived LLM pipeline for the assistant.
+
+    The prompt template, the ChatGroq client and its pooled HTTP connections are built once
+    and reused for every request; only the conversation memory changes from call to call.
+    Customer ID and appointment turns are answered locally by the intent router, and answers
+    to general questions are kept in a response cache and replayed without a Groq call. Requests
+    that do reach Groq go through the LLM scheduler's admission control and retries.
+    """
+
+    def __init__(self, model_name=GROQ_MODEL_NAME, temperature=0, groq_api_key=None,
+                 timeout=GROQ_TIMEOUT, max_connections=GROQ_MAX_CONNECTIONS, response_cache=None, router=None,
+                 scheduler=None):
+        """
+        Args:
+            model_name (str): The Groq model to use.
+            temperature (float): Sampling temperature.
+            groq_api_key (str, optional): API key. Defaults to the GROQ_API_KEY environment variable.
+            timeout (float): Request timeout in seconds.
+            max_connections (int): Size of the HTTP connection pool kept alive towards Groq.
+            response_cache (ResponseCache, optional): Cache of answers. Defaults to a new one if RESPONSE_CACHE is on.
+            router (IntentRouter, optional): Local fast path. Defaults to a new one if INTENT_ROUTER is on.
+            scheduler (LLMScheduler, optional): Admission control for Groq calls.
+        """
+        self.model_name = model_name
+        directory = default_directory()
+        if response_cache is None and RESPONSE_CACHE:
+            response_cache = ResponseCache(directory=directory)
+        if router is None and INTENT_ROUTER:
+            router = IntentRouter(directory=directory)
+        self.response_cache = response_cache
+        self.router = router
+        self.scheduler = scheduler or LLMScheduler()
+        self.prompt = PromptTemplate.from_template(INPUT_PROMPT)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self.llm = ChatGroq(temperature=temperature, model_name=model_name,
+                            groq_api_key=groq_api_key or os.getenv("GROQ_API_KEY"),
+                            http_client=self.http_client, http_async_client=self.http_async_client,
+                            request_timeout=timeout,    # The Groq SDK overrides the client timeout with its own default
+                            max_retries=0)     # The scheduler retries, with backoff shared across requests
+        self.chain = self.prompt | self.llm | StrOutputParser()
+        self.summary_chain = PromptTemplate.from_template(SUMMARY_PROMPT) | self.llm | StrOutputParser()
+        self._prompt_tokens = count_tokens(INPUT_PROMPT)
+        logger.info("Assistant engine ready with model %s", model_name)
+
+    @staticmethod
+    def _history(memory):
+        return memory.load_memory_variables({})[memory.memory_key]
+
+    def _inputs(self, question, memory):
+        with span("prompt_build"):
+            return {"chat_history": self._history(memory), "question": question}
+
+    def _tokens(self, inputs):
+        """Estimated prompt and completion tokens of a request, for the TPM quota."""
+        return self._prompt_tokens + count_tokens(inputs["chat_history"]) + count_tokens(inputs["question"]) + REPLY_TOKENS
+
+    def _key(self, inputs):
+        return (inputs["chat_history"], inputs["question"])
+
+    def _cached(self, question, inputs, on_route=None):
+        """Return an answer that needs no LLM call: routed locally or replayed from the cache."""
+        if self.router is not None:
+            routed = self.router.route(question, inputs["chat_history"], count=on_route is None)
+            if on_route is not None:
+                on_route(routed)
+            if routed is not None:
+                return routed.text
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(question, inputs["chat_history"], self.model_name)
+
+    def _store(self, question, inputs, answer):
+        if self.response_cache is not None:
+            self.response_cache.put(question, inputs["chat_history"], answer, self.model_name)
+
+    @staticmethod
+    def _remember(memory, question, answer):
+        memory.save_context({"question": question}, {"text": answer})
+
+    def _interrupted(self, memory, question, parts):
+        """Record a reply cut off mid-stream, so the next turn knows what the user already heard."""
+        if parts:
+            logger.info("Reply interrupted after %d chunks", len(parts))
+            self._remember(memory, question, "".join(parts))
+
+    def respond(self, question, memory):
+        """
+        Answer a question in the context of a conversation.
+
+        Args:
+            question (str): The question asked by the user.
+            memory (Memory): The per-session memory holding the chat history; updated with this turn.
+
+        Returns:
+            str: The response text generated by the LLM.
+        """
+        inputs = self._inputs(question, memory)
+        answer = self._cached(question, inputs)
+        if answer is None:
+            with llm_in_flight(), span("llm"):
+                answer = self.scheduler.call(lambda: self.chain.invoke(inputs), INTERACTIVE, self._tokens(inputs),
+                                             key=self._key(inputs))
+            self._store(question, inputs, answer)
+        self._remember(memory, question, answer)
+        return answer
+
+    def stream(self, question, memory):
+        """
+        Answer a question, yielding the response text as it is generated.
+
+        The turn is recorded in the memory once the full response has been received. If the
+        consumer stops early (the user barged in), the part already generated is recorded.
+
+        Args:
+            question (str): The question asked by the user.
+            memory (Memory): The per-session memory holding the chat history.
+
+        Yields:
+            str: Chunks of the response text.
+        """
+        inputs = self._inputs(question, memory)
+        cached = self._cached(question, inputs)
+        if cached is not None:
+            yield cached
+            self._remember(memory, question, cached)
+            return
+        parts = []
+        chunks = _metered(self.scheduler.stream(lambda: self.chain.stream(inputs), INTERACTIVE, self._tokens(inputs)))
+        start = time.perf_counter()
+        try:
+            for chunk in chunks:
+                if not parts:
+                    observe("llm_first_token", time.perf_counter() - start)
+                parts.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            self._interrupted(memory, question, parts)
+            raise
+        finally:
+            # Ends the upstream request right away instead of when the generator is collected
+            chunks.close()
+        answer = "".join(parts)
+        self._store(question, inputs, answer)
+        self._remember(memory, question, answer)
+
+    async def arespond(self, question, memory):
+        """Async version of `respond` that does not block the event loop during the LLM call."""
+        answer = await self.aanswer(question, memory)
+        self._remember(memory, question, answer)
+        return answer
+
+    async def aanswer(self, question, memory, cache=True, on_upstream=None, on_route=None):
+        """
+        Generate an answer without recording the turn, e.g. for a speculative request.
+
+        Args:
+            question (str): The question asked by the user.
+            memory (Memory): The per-session memory holding the chat history; left unchanged.
+            cache (bool): Whether an LLM answer may be stored in the response cache.
+            on_upstream (Callable[[int], None], optional): Called with the estimated token count
+                when the answer needs a Groq request.
+            on_route (Callable[[RoutedReply], None], optional): Called with the intent router's
+                reply (None if it passed) instead of counting the turn in the routing metric;
+                count it with `self.router.count` if the answer is used.
+
+        Returns:
+            str: The response text. Record it with `commit` once it is actually used.
+        """
+        inputs = self._inputs(question, memory)
+        answer = self._cached(question, inputs, on_route)
+        if answer is None:
+            tokens = self._tokens(inputs)
+            if on_upstream is not None:
+                on_upstream(tokens)
+            with llm_in_flight(), span("llm"):
+                answer = await self.scheduler.acall(lambda: self.chain.ainvoke(inputs), INTERACTIVE, tokens,
+                                                    key=self._key(inputs))
+            if cache:
+                self._store(question, inputs, answer)
+        return answer
+
+    def commit(self, memory, question, answer):
+        """Record a turn answered with `aanswer` in the conversation memory."""
+        self._remember(memory, question, answer)
+
+    async def astream(self, question, memory):
+        """Async version of `stream`, yielding response chunks as they arrive from Groq."""
+        inputs = self._inputs(question, memory)
+        cached = self._cached(question, inputs)
+        if cached is not None:
+            yield cached
+            self._remember(memory, question, cached)
+            return
+        parts = []
+        chunks = _ametered(self.scheduler.astream(lambda: self.chain.astream(inputs), INTERACTIVE,
+                                                  self._tokens(inputs)))
+        start = time.perf_counter()
+        try:
+            async for chunk in chunks:
+                if not parts:
+                    observe("llm_first_token", time.perf_counter() - start)
+                parts.append(chunk)
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            self._interrupted(memory, question, parts)
+            raise
+        finally:
+            await chunks.aclose()
+        answer = "".join(parts)
+        self._store(question, inputs, answer)
+        self._remember(memory, question, answer)
+
+    def summarize(self, summary, transcript, max_words=100):
+        """
+        Fold older conversation turns into a rolling summary.
+
+        Args:
+            summary (str): The summary so far, possibly empty.
+            transcript (str): Turns to add, rendered as "Human: ..." / "AI: ..." lines.
+            max_words (int): Length limit given to the LLM.
+
+        Returns:
+            str: The new summary.
+        """
+        inputs = {"summary": summary or "(none)", "transcript": transcript, "max_words": max_words}
+        tokens = count_tokens(SUMMARY_PROMPT) + count_tokens(summary) + count_tokens(transcript) + max_words * 2
+        with llm_in_flight(), span("summarization"):
+            return self.scheduler.call(lambda: self.summary_chain.invoke(inputs), BACKGROUND, tokens)
+
+    def close(self):
+        """Close the pooled HTTP connections."""
+        self.http_client.close()
+
+    async def aclose(self):
+        """Close the pooled HTTP connections, including the async pool."""
+        self.http_client.close()
+        await self.http_async_client.aclose()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide AssistantEngine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AssistantEngine()
+    return _engine
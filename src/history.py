@@ -0,0 +1,194 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.logger import logger
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "200"))
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Summaries are generated one at a time, away from the request that triggered them
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+
+def count_tokens(text):
+    """
+    Approximate the number of LLM tokens in `text`.
+
+    Words and punctuation marks count as one token each, with one extra token for every six
+    characters of a long word. This errs slightly high for English, which is the safe side
+    for a context budget, and needs no tokenizer download.
+    """
+    return sum(1 + len(piece) // 6 for piece in _TOKEN.findall(text))
+
+
+def truncate_tokens(text, max_tokens):
+    """Cut `text` after about `max_tokens` tokens, at a word boundary."""
+    total = 0
+    for match in _TOKEN.finditer(text):
+        total += 1 + len(match.group()) // 6
+        if total > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def llm_summarizer(summary, transcript, max_tokens):
+    """Fold `transcript` into `summary` with the assistant's LLM."""
+    from src.engine import get_engine
+
+    return get_engine().summarize(summary, transcript, max_words=max(10, int(max_tokens * 0.7)))
+
+
+class Turn:
+    """One question and answer, with their token count computed once."""
+
+    __slots__ = ("question", "answer", "tokens")
+
+    def __init__(self, question, answer):
+        self.question = question
+        self.answer = answer
+        self.tokens = count_tokens(question) + count_tokens(answer) + 4     # + the "Human:"/"AI:" prefixes
+
+    def render(self):
+        return f"Human: {self.question}\nAI: {self.answer}"
+
+
+class TokenBudgetMemory:
+    """
+    Conversation memory whose rendered history stays within a token budget.
+
+    The most recent turns are kept verbatim as long as they fit in `token_budget`. Older
+    turns are folded into a rolling summary by a background worker, so the request that
+    pushed the history over budget is not delayed; until the summary is ready they stay
+    in the history verbatim. The rendered history is "summary, pinned turn, recent turns",
+    placed after the prompt's static text, so that text stays a byte-identical prefix.
+
+    It implements the parts of the LangChain memory interface the assistant uses:
+    `memory_key`, `load_memory_variables` and `save_context`.
+
+    Args:
+        token_budget (int): Tokens allowed for the verbatim turns.
+        summary_tokens (int): Tokens allowed for the rolling summary.
+        pin (Callable[[str], bool], optional): Questions for which this returns True are never
+            summarized away; the first such turn is kept verbatim (e.g. the customer ID turn).
+        summarizer (Callable, optional): `summarizer(summary, transcript, max_tokens) -> str`.
+            Defaults to the assistant's LLM.
+        on_summarized (Callable[[TokenBudgetMemory], None], optional): Called from the worker
+            once a summary has been folded in, so stores that serialize the memory can save it again.
+    """
+
+    memory_key = "chat_history"
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, summary_tokens=HISTORY_SUMMARY_TOKENS, pin=None,
+                 summarizer=None, on_summarized=None):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.pin = pin
+        self.summarizer = summarizer or llm_summarizer
+        self.on_summarized = on_summarized
+        self.summary = ""
+        self.pinned = None
+        self.turns = []
+        self.version = 0            # Bumped whenever a turn is recorded or the history is cleared
+        self._tokens = 0            # Tokens of self.turns, kept up to date incrementally
+        self._summarizing = 0       # Leading turns handed to the summarizer and not yet folded in
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        """Tokens the rendered history currently takes, approximately."""
+        pinned = self.pinned.tokens if self.pinned is not None else 0
+        return count_tokens(self.summary) + pinned + self._tokens
+
+    def load_memory_variables(self, inputs):
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of the earlier conversation: {self.summary}")
+            if self.pinned is not None:
+                parts.append(self.pinned.render())
+            parts.extend(turn.render() for turn in self.turns)
+        return {self.memory_key: "\n".join(parts)}
+
+    def save_context(self, inputs, outputs):
+        turn = Turn(inputs["question"], outputs["text"])
+        with self._lock:
+            self.version += 1
+            if self.pinned is None and self.pin is not None and self.pin(turn.question):
+                self.pinned = turn
+            else:
+                self.turns.append(turn)
+                self._tokens += turn.tokens
+            self._maybe_summarize()
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self.summary = ""
+            self.pinned = None
+            self.turns = []
+            self._tokens = 0
+            self._summarizing = 0
+
+    def _maybe_summarize(self):
+        """Hand the oldest turns to the summarizer once the verbatim turns exceed the budget. Lock held."""
+        if self._summarizing or self._tokens <= self.token_budget:
+            return
+        # Summarize down to half the budget so this does not run again on the very next turn
+        excess, count = self._tokens - self.token_budget // 2, 0
+        while count < len(self.turns) - 1 and excess > 0:
+            excess -= self.turns[count].tokens
+            count += 1
+        if not count:
+            return
+        self._summarizing = count
+        transcript = "\n".join(turn.render() for turn in self.turns[:count])
+        _summary_executor.submit(self._summarize, self.summary, transcript, count)
+
+    def _summarize(self, summary, transcript, count):
+        try:
+            new_summary = truncate_tokens(self.summarizer(summary, transcript, self.summary_tokens).strip(),
+                                          self.summary_tokens)
+        except Exception as e:
+            # Keep the turns verbatim; the next save_context tries again
+            logger.error("History summarization failed, keeping %d old turns: %s", count, e)
+            with self._lock:
+                if self._summarizing == count:
+                    self._summarizing = 0
+            return
+        with self._lock:
+            if self._summarizing != count:      # Cleared in the meantime
+                return
+            folded = self.turns[:count]
+            self.turns = self.turns[count:]
+            self._tokens -= sum(turn.tokens for turn in folded)
+            self.summary = new_summary
+            self._summarizing = 0
+            self._maybe_summarize()
+        if self.on_summarized is not None:
+            try:
+                self.on_summarized(self)
+            except Exception as e:
+                logger.error("Saving the summarized history failed: %s", e)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "pinned": [self.pinned.question, self.pinned.answer] if self.pinned is not None else None,
+                "turns": [[turn.question, turn.answer] for turn in self.turns],
+            }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        """Rebuild a memory from `to_dict` output; turns still over budget are summarized on the next save_context."""
+        memory = cls(**kwargs)
+        memory.summary = data.get("summary", "")
+        if data.get("pinned"):
+            memory.pinned = Turn(*data["pinned"])
+        memory.turns = [Turn(question, answer) for question, answer in data.get("turns", [])]
+        memory._tokens = sum(turn.tokens for turn in memory.turns)
+        return memory
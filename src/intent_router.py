@@ -0,0 +1,214 @@
+import os
+import re
+from dataclasses import dataclass
+from datetime import time as clock
+
+from src.logger import logger
+from src.metrics import INTENT_ROUTES
+
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "1") == "1"
+CUSTOMERS_FILE = os.getenv("CUSTOMERS_FILE")        # One customer ID per line; defaults to the prompt's list
+APPOINTMENT_OPEN = os.getenv("APPOINTMENT_OPEN", "09:00")
+APPOINTMENT_CLOSE = os.getenv("APPOINTMENT_CLOSE", "16:00")
+
+DEFAULT_CUSTOMER_IDS = ("18", "48", "98")   # Same list as in the assistant prompt
+
+_UNITS = {"zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+          "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+          "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19}
+_TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80,
+         "ninety": 90}
+_NUMBER_WORDS = re.compile(r"\b(?:(%s)[\s-]+(%s)|(%s)|(%s))\b" % (
+    "|".join(_TENS), "|".join(k for k in _UNITS if 0 < _UNITS[k] < 10), "|".join(_TENS), "|".join(_UNITS)))
+
+# ID turns are only answered locally when the ID is all they say, give or take a filler word;
+# "my customer ID is 48, turn off the lights" still needs the LLM
+_FILLER = r"(?:(?:yes|yeah|sure|okay|ok|hi|hello|so|well)\W+)*"
+_THANKS = r"(?:\W+(?:please|thanks|thank you))?\W*"
+_ID_STATEMENT = re.compile(_FILLER + r"(?:(?:my|the)\s+)?customer\s+(?:id|i\.d\.|number)(?:\s+(?:is|was|it's))?\W*(\d+)"
+                           + _THANKS)
+_ID_ANSWER = re.compile(_FILLER + r"(?:(?:it's|it is|that's|that is|my id is)\s+)?(\d+)" + _THANKS)
+_ID_REQUEST = re.compile(r"customer\s*id", re.IGNORECASE)
+# Only a plain request for a new appointment is booked locally; changes, reminders and device
+# commands that happen to say "book" or "schedule" go to the LLM
+_APPOINTMENT = re.compile(r"\b(?:book|schedule|make|set up|arrange|reserve|want|need|like|get)\b(?:\s+\w+){0,3}?"
+                          r"\s+appointment\b")
+_NOT_BOOKING = re.compile(r"\b(?:cancel\w*|reschedul\w*|move|change|postpone|delete|remove|remind\w*|alarms?|"
+                          r"timers?|lights?|lamps?|thermostat|temperature|heating|fan|tv|doors?|locks?|music|"
+                          r"devices?|turn)\b")
+_TIME = re.compile(r"\b(\d{1,2})(?:[:.\s]([0-5]\d))?\s*(a\.?\s?m\.?|p\.?\s?m\.?|o'?clock)?(?=\W|$)|\b(noon|midday)\b")
+_DAY = re.compile(r"\b((?:next\s+|this\s+)?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)|"
+                  r"today|tomorrow)\b")
+_AI_LINE = re.compile(r"^AI:(.*)$", re.MULTILINE)
+_HUMAN_LINE = re.compile(r"^Human:(.*)$", re.MULTILINE)
+
+
+def _replace_number_words(text):
+    """Turn spelled-out numbers below 100 ("forty eight") into digits, as Whisper sometimes writes them."""
+    def number(match):
+        tens, unit, tens_only, unit_only = match.groups()
+        if tens:
+            return str(_TENS[tens] + _UNITS[unit])
+        return str(_TENS[tens_only] if tens_only else _UNITS[unit_only])
+    return _NUMBER_WORDS.sub(number, text)
+
+
+def _normalize(text):
+    return " ".join(_replace_number_words(text.lower()).split())
+
+
+def _parse_clock(value):
+    hours, minutes = value.split(":")
+    return clock(int(hours), int(minutes))
+
+
+def _format_clock(t):
+    return t.strftime("%I:%M %p").lstrip("0").lower()
+
+
+class CustomerDirectory:
+    """Set of valid customer IDs, indexed for O(1) lookup."""
+
+    def __init__(self, customer_ids=DEFAULT_CUSTOMER_IDS):
+        self._ids = frozenset(str(int(i)) for i in customer_ids)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    def __contains__(self, customer_id):
+        try:
+            return str(int(customer_id)) in self._ids
+        except ValueError:
+            return False
+
+    def find(self, text):
+        """Return the first known customer ID mentioned in `text`, or None."""
+        for number in re.findall(r"\d+", _replace_number_words(text.lower())):
+            if number in self:
+                return number
+        return None
+
+
+def default_directory():
+    """Return the directory from CUSTOMERS_FILE, or the IDs listed in the assistant prompt."""
+    return CustomerDirectory.from_file(CUSTOMERS_FILE) if CUSTOMERS_FILE else CustomerDirectory()
+
+
+def is_validated(history, directory):
+    """True if the user gave a known customer ID earlier in the conversation."""
+    return any(directory.find(line) for line in _HUMAN_LINE.findall(history or ""))
+
+
+@dataclass
+class RoutedReply:
+    """An answer produced locally instead of by the LLM."""
+    intent: str         # customer_id / appointment
+    text: str
+
+
+class IntentRouter:
+    """
+    Answers the two most common turns of the call flow without an LLM round trip.
+
+    - Turns that only state a customer ID ("my customer ID is 48", or a bare number after
+      Euron asked for the ID) are checked against the customer directory.
+    - Requests to book an appointment at a clear time ("10 am", "10:30", "noon") are checked
+      against the opening window.
+
+    Anything else, or anything ambiguous, returns None and goes to the LLM. Replies follow the
+    prompt's rules: under ten words and never repeating a customer ID.
+    """
+
+    def __init__(self, directory=None, open_at=APPOINTMENT_OPEN, close_at=APPOINTMENT_CLOSE):
+        self.directory = directory or default_directory()
+        self.open_at = _parse_clock(open_at)
+        self.close_at = _parse_clock(close_at)
+        self.window = f"{_format_clock(self.open_at)} and {_format_clock(self.close_at)}"
+
+    def route(self, question, history, count=True):
+        """
+        Answer a question locally if it is a customer ID or appointment turn.
+
+        Args:
+            question (str): The transcribed user turn.
+            history (str): The chat history as rendered into the prompt.
+            count (bool): Count the turn in the routing metric now. Pass False when the reply
+                may not be used, e.g. for a speculative request, and `count` it once it is.
+
+        Returns:
+            RoutedReply or None: The reply, or None if the LLM should answer.
+        """
+        text = _normalize(question)
+        reply = self._customer_id(text, history) or self._appointment(text, history)
+        if count:
+            self.count(reply)
+        return reply
+
+    @staticmethod
+    def count(reply):
+        """Count a turn answered with `reply` (None: by the LLM) in the routing metric."""
+        INTENT_ROUTES.labels(reply.intent if reply else "llm").inc()
+        if reply is not None:
+            logger.info("Intent router answered a %s turn", reply.intent)
+
+    def _customer_id(self, text, history):
+        match = _ID_STATEMENT.fullmatch(text)
+        if match is None:
+            # A turn that is just a number answers Euron's request for the ID
+            asked = _AI_LINE.findall(history or "")
+            if not (asked and _ID_REQUEST.search(asked[-1])):
+                return None
+            match = _ID_ANSWER.fullmatch(text)
+            if match is None:
+                return None
+        customer_id = match.group(1)
+        if customer_id in self.directory:
+            return RoutedReply("customer_id", "Thank you, your customer ID is confirmed. How can I help?")
+        return RoutedReply("customer_id", "Sorry, that customer ID is not in our records.")
+
+    def _appointment(self, text, history):
+        if not _APPOINTMENT.search(text) or _NOT_BOOKING.search(text):
+            return None
+        requested = self._requested_time(text)
+        if requested is None:
+            return None
+        if not is_validated(history, self.directory):
+            if self.directory.find(text):
+                # "My ID is 48, book me at 10" needs both intents; leave it to the LLM
+                return None
+            return RoutedReply("appointment", "Please tell me your customer ID first.")
+        if not self.open_at <= requested <= self.close_at:
+            return RoutedReply("appointment", f"Sorry, appointments are only between {self.window}.")
+        day = _DAY.search(text)
+        when = _format_clock(requested)
+        if day:
+            when = f"{re.sub(r'[a-z]+day', lambda m: m.group().capitalize(), day.group(1))} at {when}"
+        return RoutedReply("appointment", f"Done, your appointment is booked for {when}.")
+
+    @staticmethod
+    def _requested_time(text):
+        """Return the single clock time mentioned in `text`, or None if there is none or several."""
+        times = []
+        for match in _TIME.finditer(text):
+            hours, minutes, suffix, noon = match.groups()
+            if noon:
+                times.append(clock(12, 0))
+                continue
+            hours, minutes = int(hours), int(minutes or 0)
+            suffix = (suffix or "").replace(".", "").replace(" ", "")
+            if not suffix and ":" not in match.group():
+                # A number is only a time with am/pm/o'clock or as HH:MM; "a table for 2" is not
+                continue
+            if hours > 23 or minutes > 59:
+                return None
+            if suffix == "pm" and hours < 12:
+                hours += 12
+            elif suffix == "am" and hours == 12:
+                hours = 0
+            elif suffix not in ("am", "pm") and 1 <= hours <= 8:
+                # Without am/pm, office-hour readings win: "at 2" means 2 pm
+                hours += 12
+            times.append(clock(hours, minutes))
+        return times[0] if len(set(times)) == 1 else None
@@ -1,8 +1,12 @@
 import os
+import json
+import time
+import queue
+import atexit
 import logging
+import multiprocessing
 
-from contextlib import suppress
-from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 try:
     from dotenv import find_dotenv, load_dotenv
@@ -11,53 +15,125 @@ try:
 except ImportError:
     pass
 
-
-def create_logs():
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DIR = os.getenv("LOG_DIR", os.path.join(os.getcwd(), "logs"))
+LOG_FILE = os.getenv("LOG_FILE", "")             # File name in LOG_DIR, '{pid}' is replaced; '-' logs to stderr
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")     # text | json
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "10"))
+LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+
+TEXT_FORMAT = "[%(asctime)s] %(lineno)d - %(filename)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and goes into the JSON
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, including fields passed with `extra=`."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "file": record.filename,
+            "line": record.lineno,
+            "function": record.funcName,
+            "thread": record.threadName,
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RotatingLogFileHandler(RotatingFileHandler):
     """
-    Create logs for the application.
+    File handler that rolls over when the file reaches `max_bytes` or is `interval` seconds old,
+    whichever comes first, keeping `backup_count` numbered backups (euron.log.1, .2, ...).
+    """
+
+    def __init__(self, filename, max_bytes, interval, backup_count):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.interval = interval
+        self.rollover_at = time.time() + interval
 
-    This function sets up the logging configuration for the application. It creates a logger object and configures it to write logs to both a local log file and AWS CloudWatch. The logs are stored in a directory named after the current date, and the log file is named after the current time. The log file path is returned.
+    def shouldRollover(self, record):
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class _DeferredQueueHandler(QueueHandler):
     """
-    logger = logging.getLogger(__name__)
-    now = datetime.now()
+    QueueHandler that leaves all formatting to the listener thread.
 
-    LOG_FILE_FOLDER = now.strftime('%m_%d_%Y')
-    LOG_FILE = now.strftime('%H-%M-%S') + ".log"
+    The stock handler formats the message in the logging thread so records can be pickled;
+    here the queue never leaves the process, so the caller only pays for an enqueue.
+    """
 
-    logs_path = os.path.join(os.getcwd(), 'logs', LOG_FILE_FOLDER)
-    os.makedirs(logs_path, exist_ok=True)
+    def prepare(self, record):
+        return record
 
-    LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-    logging.basicConfig(filename=LOG_FILE_PATH,
-                        format="[%(asctime)s] %(lineno)d - %(filename)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s", level=logging.INFO)
+_listener = None
 
-    # Set the log level
-    logger.setLevel(logging.INFO)
 
-    # Cleanup old logs
-    cleanup_old_logs()
+def log_file_name():
+    """
+    Return the log file name of this process.
 
-    return logger
+    Rotation renames the file, which only one process can do safely, so the workers that
+    `uvicorn --workers N` spawns each write their own euron-<pid>.log.
+    """
+    if LOG_FILE:
+        return LOG_FILE.replace("{pid}", str(os.getpid()))
+    if multiprocessing.parent_process() is not None:
+        return f"euron-{os.getpid()}.log"
+    return "euron.log"
 
 
-def cleanup_old_logs():
+def create_logs():
     """
-    Deletes old log files and folders that are more than 4 days old.
+    Create logs for the application.
 
-    This function iterates over the directories in the 'logs' folder and checks if each folder represents a valid date. If a folder is older than 7 days, it deletes all the files inside the folder and then deletes the folder itself.
+    Records are put on an in-memory queue and written by a background listener thread, so
+    logging never blocks on disk I/O. The listener writes to logs/euron.log (one file per
+    worker process, see `log_file_name`), which is rotated by size (LOG_MAX_MB) and age
+    (LOG_ROTATE_HOURS) with LOG_BACKUPS old files kept. With LOG_FILE=- it writes to stderr
+    instead and leaves rotation to the process manager. Set LOG_FORMAT=json for one JSON
+    object per line.
     """
-    logs_directory = os.path.join(os.getcwd(), 'logs')
-    for folder_name in os.listdir(logs_directory):
-        folder_path = os.path.join(logs_directory, folder_name)
-        if os.path.isdir(folder_path):
-            with suppress(ValueError, Exception):
-                folder_date = datetime.strptime(folder_name, '%m_%d_%Y')
-                if datetime.now() - folder_date > timedelta(days=4):
-                    for file_name in os.listdir(folder_path):
-                        file_path = os.path.join(folder_path, file_name)
-                        os.remove(file_path)
-                    os.rmdir(folder_path)
+    global _listener
+    logger = logging.getLogger(__name__)
+    if _listener is not None:
+        return logger
+
+    if LOG_FILE == "-":
+        handler = logging.StreamHandler()
+    else:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = RotatingLogFileHandler(os.path.join(LOG_DIR, log_file_name()), max_bytes=int(LOG_MAX_MB * 1024 * 1024),
+                                         interval=LOG_ROTATE_HOURS * 3600, backup_count=LOG_BACKUPS)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+
+    return logger
 
 
 logger = create_logs()
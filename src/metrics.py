@@ -0,0 +1,166 @@
+import os
+import time
+import queue
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST,
+                               generate_latest, start_http_server)
+from prometheus_client.openmetrics import exposition as openmetrics
+
+from src.logger import logger
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))   # Used by the Streamlit apps; 0 disables
+# Set by uvicorn deployments with several workers so /metrics aggregates all of them
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+STAGES = ("capture", "silence_check", "preprocess", "transcription", "prompt_build", "llm", "llm_first_token",
+          "tts_synthesis", "playback", "summarization")
+
+STAGE_SECONDS = Histogram(
+    "euron_stage_seconds", "Time spent in each stage of a voice turn", ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0),
+)
+STAGE_ERRORS = Counter("euron_stage_errors_total", "Stage executions that raised an exception", ["stage"])
+TURNS = Counter("euron_turns_total", "Conversation turns started")
+QUEUE_DEPTH = Gauge("euron_queue_depth", "Items waiting in a pipeline queue", ["queue"],
+                    multiprocess_mode="livesum")
+RESPONSE_CACHE_REQUESTS = Counter("euron_response_cache_total", "LLM response cache lookups", ["result"])
+INTENT_ROUTES = Counter("euron_intent_routes_total", "Turns by who answered them", ["intent"])
+LLM_RETRIES = Counter("euron_llm_retries_total", "LLM requests retried, by error", ["reason"])
+LLM_REJECTED = Counter("euron_llm_rejected_total", "LLM requests turned away by admission control", ["reason"])
+LLM_COALESCED = Counter("euron_llm_coalesced_total", "LLM requests served by an identical request in flight")
+LLM_HEDGES = Counter("euron_llm_hedges_total", "Hedged second LLM requests sent")
+SPECULATIONS = Counter("euron_speculations_total", "Speculative LLM requests by outcome", ["outcome"])
+SPECULATION_WASTED_TOKENS = Counter("euron_speculation_wasted_tokens_total",
+                                    "Estimated tokens spent on speculative requests that were thrown away")
+AUDIO_INPUT_SECONDS = Counter("euron_audio_input_seconds_total", "Audio handed to the ASR front-end")
+AUDIO_TRIMMED_SECONDS = Counter("euron_audio_trimmed_seconds_total",
+                                "Leading and trailing non-speech removed before transcription")
+BARGE_INS = Counter("euron_barge_ins_total", "Replies cut off because the user started speaking")
+VOICE_SESSIONS = Gauge("euron_voice_sessions", "Voice calls connected to /ws/voice", multiprocess_mode="livesum")
+LLM_IN_FLIGHT = Gauge("euron_llm_in_flight", "LLM requests currently in progress", multiprocess_mode="livesum")
+
+_session_id = contextvars.ContextVar("session_id", default=None)
+_turn_id = contextvars.ContextVar("turn_id", default=None)
+_turn_counter = itertools.count(1)
+_EXEMPLAR_ID_CHARS = 48
+
+
+@contextmanager
+def turn_context(session_id=None, turn_id=None):
+    """
+    Attach a session and turn id to every span recorded inside the block (and in threads
+    started with a copy of the current context).
+    """
+    if turn_id is None:
+        turn_id = str(next(_turn_counter))
+    TURNS.inc()
+    session_token = _session_id.set(session_id)
+    turn_token = _turn_id.set(turn_id)
+    try:
+        yield turn_id
+    finally:
+        _turn_id.reset(turn_token)
+        _session_id.reset(session_token)
+
+
+def observe(stage, seconds):
+    """Record a stage duration measured elsewhere, tagged with the current session and turn."""
+    session_id, turn_id = _session_id.get(), _turn_id.get()
+    # Ids come from clients; prometheus_client rejects exemplars over 128 characters in total
+    exemplar = {k: str(v)[:_EXEMPLAR_ID_CHARS] for k, v in (("session_id", session_id), ("turn_id", turn_id)) if v}
+    try:
+        STAGE_SECONDS.labels(stage).observe(seconds, exemplar=exemplar or None)
+    except ValueError:
+        STAGE_SECONDS.labels(stage).observe(seconds)
+    logger.debug("span stage=%s session=%s turn=%s seconds=%.4f", stage, session_id, turn_id, seconds)
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one execution of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except (GeneratorExit, asyncio.CancelledError):
+        # A streaming consumer stopped early (e.g. on barge-in); that is not a failure of the stage
+        raise
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def llm_in_flight():
+    """Count the enclosed block as one in-flight LLM request."""
+    LLM_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        LLM_IN_FLIGHT.dec()
+
+
+class MeteredQueue(queue.Queue):
+    """queue.Queue that publishes its depth as the `euron_queue_depth` gauge."""
+
+    def __init__(self, name, maxsize=0):
+        super().__init__(maxsize)
+        self._depth = QUEUE_DEPTH.labels(name)
+
+    # _put and _get run with the queue's mutex held, so the gauge always matches the queue
+    def _put(self, item):
+        super()._put(item)
+        self._depth.inc()
+
+    def _get(self):
+        item = super()._get()
+        self._depth.dec()
+        return item
+
+
+def render_metrics(accept=None):
+    """
+    Render all metrics for a /metrics endpoint.
+
+    Args:
+        accept (str, optional): The request's Accept header; OpenMetrics clients also get exemplars.
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    if accept and "application/openmetrics-text" in accept:
+        return openmetrics.generate_latest(registry), openmetrics.CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics on a side port once per process (Streamlit reruns call this repeatedly)."""
+    global _server_started
+    if not port:
+        return
+    with _server_lock:
+        if _server_started:
+            return
+        try:
+            start_http_server(port)
+        except OSError as e:
+            logger.warning("Could not start metrics server on port %d: %s", port, e)
+        else:
+            logger.info("Serving metrics on port %d", port)
+        _server_started = True
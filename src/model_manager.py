@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import torch
+import whisper
+
+from src.logger import logger
+
+# Model selection, overridable through the environment / .env file
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")     # tiny.en, base.en, small, ...
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE")                      # cpu / cuda, auto-detected if unset
+WHISPER_DTYPE = os.getenv("WHISPER_DTYPE")                        # float32 / float16 / int8, follows the device if unset
+WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "1") == "1"
+WHISPER_PROFILE = os.getenv("WHISPER_PROFILE", "default")         # default / cpu-low-latency
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", "0"))          # Torch intra-op threads, 0 = torch's choice
+
+PROFILES = ("default", "cpu-low-latency")
+
+# Temperature fallback of the low-latency profile: one retry at most instead of five
+LOW_LATENCY_TEMPERATURES = (0.0, 0.2)
+
+
+def quantize_int8(model):
+    """
+    Apply dynamic int8 quantization to the Linear layers of a Whisper model, in place.
+
+    Whisper uses its own `Linear` subclass, which the quantizer does not match; in float32 it
+    computes exactly what `nn.Linear` does, so the layers are turned into plain `nn.Linear` first.
+    Convolutions, embeddings and layer norms stay in float32.
+    """
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def pin_threads(threads):
+    """Fix the number of torch CPU threads so decoding does not oversubscribe the cores."""
+    torch.set_num_threads(threads)
+    try:
+        # Only allowed before the first parallel operation of the process
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+@dataclass
+class LoadedModel:
+    """A Whisper model held by the manager together with how it was loaded."""
+    model: object
+    size: str
+    device: str
+    dtype: str
+    load_seconds: float
+    warmup_seconds: float = 0.0
+    profile: str = "default"
+    # Whisper installs its kv-cache hooks on the model for each decode, so decodes must not overlap
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def decode_options(self):
+        """Options valid for both `transcribe` and `DecodingOptions`, matching the loaded dtype and profile."""
+        options = {"fp16": self.dtype == "float16"}
+        if self.profile == "cpu-low-latency":
+            # Skip language detection and decode greedily
+            options.update(language="en", beam_size=None, best_of=None)
+        return options
+
+    @property
+    def transcribe_options(self):
+        """Options passed to `transcribe`: the decode options plus the temperature fallback."""
+        options = self.decode_options
+        if self.profile == "cpu-low-latency":
+            options["temperature"] = LOW_LATENCY_TEMPERATURES
+        return options
+
+
+class WhisperModelManager:
+    """
+    Process-wide cache of Whisper models.
+
+    Each (size, device, dtype, profile) combination is loaded once and then shared by every
+    caller in the process, so Streamlit reruns and concurrent sessions reuse the same weights.
+
+    The 'cpu-low-latency' profile targets CPU-only nodes: it loads the model on the CPU with
+    int8 Linear layers, pins the language to English, decodes greedily with at most one
+    temperature fallback, and fixes the torch thread count (WHISPER_THREADS, or all cores).
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self._unmanaged_lock = threading.Lock()     # For models loaded elsewhere
+
+    @staticmethod
+    def _resolve(size, device, dtype, profile):
+        size = size or WHISPER_MODEL_SIZE
+        profile = profile or WHISPER_PROFILE
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown Whisper profile {profile!r}, expected one of {', '.join(PROFILES)}")
+        low_latency = profile == "cpu-low-latency"
+        device = device or WHISPER_DEVICE or ("cpu" if low_latency or not torch.cuda.is_available() else "cuda")
+        dtype = dtype or WHISPER_DTYPE or ("int8" if low_latency and device == "cpu" else
+                                           "float16" if device.startswith("cuda") else "float32")
+        if dtype == "float16" and device == "cpu":
+            logger.warning("float16 is not supported on CPU, loading Whisper '%s' as float32", size)
+            dtype = "float32"
+        if dtype == "int8" and device != "cpu":
+            logger.warning("int8 is only supported on CPU, loading Whisper '%s' as float16", size)
+            dtype = "float16"
+        return size, device, dtype, profile
+
+    def get(self, size=None, device=None, dtype=None, warmup=None, profile=None):
+        """
+        Return the model for the given configuration, loading it on first use.
+
+        Args:
+            size (str, optional): Whisper model name, e.g. 'tiny.en', 'base.en', 'small'.
+            device (str, optional): Torch device to load onto.
+            dtype (str, optional): 'float32', 'float16' or 'int8' (CPU only).
+            warmup (bool, optional): Run a warm-up decode after loading. Defaults to WHISPER_WARMUP.
+            profile (str, optional): 'default' or 'cpu-low-latency'. Defaults to WHISPER_PROFILE.
+
+        Returns:
+            The loaded Whisper model.
+        """
+        key = self._resolve(size, device, dtype, profile)
+        entry = self._models.get(key)
+        if entry is not None:
+            return entry.model
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                entry = self._load(*key, warmup=WHISPER_WARMUP if warmup is None else warmup)
+                self._models[key] = entry
+        return entry.model
+
+    def _load(self, size, device, dtype, profile, warmup):
+        if device == "cpu" and (WHISPER_THREADS or profile == "cpu-low-latency"):
+            pin_threads(WHISPER_THREADS or os.cpu_count() or 1)
+        start = time.perf_counter()
+        model = whisper.load_model(size, device=device)
+        if dtype == "int8":
+            model = quantize_int8(model)
+        entry = LoadedModel(model=model, size=size, device=device, dtype=dtype,
+                            load_seconds=time.perf_counter() - start, profile=profile)
+        logger.info("Loaded Whisper '%s' on %s (%s, %s profile) in %.2fs", size, device, dtype, profile,
+                    entry.load_seconds)
+
+        if warmup:
+            entry.warmup_seconds = self._warmup(entry)
+            logger.info("Warmed up Whisper '%s' in %.2fs", size, entry.warmup_seconds)
+        return entry
+
+    @staticmethod
+    def _warmup(entry):
+        """Decode one second of synthetic noise so kernels and buffers are ready for the first user."""
+        start = time.perf_counter()
+        audio = (np.random.default_rng(0).standard_normal(16000) * 0.01).astype(np.float32)
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=entry.model.dims.n_mels)
+        options = whisper.DecodingOptions(without_timestamps=True, **{"language": "en", **entry.decode_options})
+        whisper.decode(entry.model, mel.to(entry.model.device), options)
+        return time.perf_counter() - start
+
+    def entry(self, model):
+        """Return the LoadedModel record for a model handed out by this manager, if any."""
+        for entry in self._models.values():
+            if entry.model is model:
+                return entry
+        return None
+
+    def lock(self, model):
+        """
+        Return the lock to hold while decoding with a model.
+
+        Whisper is not safe for concurrent decodes on one model: each decode installs kv-cache
+        hooks on the shared modules, and overlapping decodes overwrite each other's caches.
+        """
+        entry = self.entry(model)
+        return entry.lock if entry is not None else self._unmanaged_lock
+
+    def decode_options(self, model):
+        """Return the default `DecodingOptions` fields for a model handed out by this manager."""
+        entry = self.entry(model)
+        return entry.decode_options if entry is not None else {}
+
+    def transcribe_options(self, model):
+        """Return the default `transcribe` options for a model handed out by this manager."""
+        entry = self.entry(model)
+        return entry.transcribe_options if entry is not None else {}
+
+    def stats(self):
+        """Return load and warm-up timings for every loaded model."""
+        return [
+            {"size": e.size, "device": e.device, "dtype": e.dtype, "profile": e.profile,
+             "threads": torch.get_num_threads() if e.device == "cpu" else None,
+             "load_seconds": e.load_seconds, "warmup_seconds": e.warmup_seconds}
+            for e in self._models.values()
+        ]
+
+
+model_manager = WhisperModelManager()
@@ -0,0 +1,58 @@
+import queue
+import threading
+
+from src.logger import logger
+from src.metrics import MeteredQueue
+
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    One stage of the voice pipeline running in its own thread.
+
+    Items are taken from `inputs`, passed through `process`, and non-None results are put on
+    `outputs`. Chaining stages through queues lets capture, ASR, the LLM and playback work on
+    different turns at the same time instead of running strictly one after another.
+    """
+
+    def __init__(self, process, inputs, name="stage"):
+        self.process = process
+        self.inputs = inputs
+        self.outputs = MeteredQueue(name)
+        self.name = name
+        self._processing = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self.inputs.get()
+            if item is _STOP:
+                break
+            self._processing = True
+            try:
+                result = self.process(item)
+            except Exception as e:
+                logger.error("Pipeline stage %s failed: %s", self.name, e)
+            else:
+                if result is not None:
+                    self.outputs.put(result)
+            finally:
+                self._processing = False
+
+    @property
+    def busy(self):
+        """True while the stage has work queued or in progress."""
+        return self._processing or not self.inputs.empty()
+
+    def get(self, timeout=None):
+        """Return the next result, or None if none arrived within `timeout` seconds."""
+        try:
+            return self.outputs.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """Let the stage finish the items already queued, then exit its thread."""
+        self.inputs.put(_STOP)
@@ -0,0 +1,93 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.audio import SAMPLE_RATE
+from src.logger import logger
+from src.metrics import AUDIO_INPUT_SECONDS, AUDIO_TRIMMED_SECONDS, span
+
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "1") == "1"
+AUDIO_TARGET_DBFS = float(os.getenv("AUDIO_TARGET_DBFS", "-20"))     # Speech level after normalization
+AUDIO_MAX_GAIN_DB = float(os.getenv("AUDIO_MAX_GAIN_DB", "20"))      # Limit on the boost of quiet speech
+AUDIO_TRIM_DBFS = float(os.getenv("AUDIO_TRIM_DBFS", "-50"))         # Frames below this are never speech
+AUDIO_TRIM_PAD_MS = int(os.getenv("AUDIO_TRIM_PAD_MS", "100"))
+
+_EPS = 1e-10
+
+
+@dataclass
+class Preprocessed:
+    """Audio ready for Whisper, with what the front-end did to it."""
+    audio: np.ndarray       # float32 samples, empty if no frame looked like speech
+    input_samples: int
+    gain_db: float = 0.0
+    sample_rate: int = SAMPLE_RATE
+
+    @property
+    def trimmed_seconds(self):
+        return (self.input_samples - self.audio.size) / self.sample_rate
+
+    @property
+    def is_empty(self):
+        return self.audio.size == 0
+
+
+def frame_dbfs(audio, frame_length):
+    """Return the RMS level in dBFS of each `frame_length` frame of float32 audio; the last frame is zero-padded."""
+    frames = np.pad(audio, (0, -audio.size % frame_length)).reshape(-1, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return 20 * np.log10(rms + _EPS)
+
+
+def preprocess(audio, sample_rate=SAMPLE_RATE, target_dbfs=AUDIO_TARGET_DBFS, max_gain_db=AUDIO_MAX_GAIN_DB,
+               trim_dbfs=AUDIO_TRIM_DBFS, dynamic_range_db=35.0, pad_ms=AUDIO_TRIM_PAD_MS, frame_ms=30):
+    """
+    Clean up an utterance before it is handed to Whisper.
+
+    Whisper pads every input to 30 seconds, so leading and trailing silence only costs decode
+    time, and near-empty audio is where it hallucinates words. All steps work on whole arrays:
+
+    1. DC offset removal: the mean is subtracted.
+    2. Edge trimming: frames quieter than `trim_dbfs`, or more than `dynamic_range_db` below the
+       loudest frame, are non-speech; everything before the first and after the last speech
+       frame is dropped, except `pad_ms` of margin. Silence inside the utterance is kept.
+    3. Gain normalization: the RMS level of the speech frames is brought to `target_dbfs`,
+       boosting by at most `max_gain_db`, and scaled down if the peak would clip.
+
+    Args:
+        audio (np.ndarray): float32 samples in [-1, 1].
+        sample_rate (int): Sample rate in Hertz.
+
+    Returns:
+        Preprocessed: The cleaned audio (empty if nothing looked like speech) and what was removed.
+    """
+    with span("preprocess"):
+        audio = np.asarray(audio, dtype=np.float32)
+        result = Preprocessed(audio=audio[:0], input_samples=audio.size, sample_rate=sample_rate)
+        if audio.size:
+            audio = audio - audio.mean()
+            frame_length = max(1, int(sample_rate * frame_ms / 1000))
+            levels = frame_dbfs(audio, frame_length)
+            speech = np.flatnonzero(levels > max(trim_dbfs, levels.max() - dynamic_range_db))
+            if speech.size:
+                pad = int(sample_rate * pad_ms / 1000)
+                start = max(0, speech[0] * frame_length - pad)
+                end = min(audio.size, (speech[-1] + 1) * frame_length + pad)
+                audio = audio[start:end]
+
+                # Level of the speech frames only, so pauses do not inflate the gain
+                speech_rms = np.sqrt(np.mean(np.power(10, levels[speech] / 10)))
+                gain_db = min(target_dbfs - 20 * np.log10(speech_rms + _EPS), max_gain_db)
+                gain = 10 ** (gain_db / 20)
+                peak = float(np.max(np.abs(audio)))
+                if peak * gain > 0.99:
+                    gain = 0.99 / peak
+                result.audio = (audio * gain).astype(np.float32)
+                result.gain_db = float(20 * np.log10(gain))
+
+    AUDIO_INPUT_SECONDS.inc(result.input_samples / sample_rate)
+    AUDIO_TRIMMED_SECONDS.inc(result.trimmed_seconds)
+    logger.debug("Audio front-end: %.2fs in, %.2fs trimmed, %+.1f dB gain", result.input_samples / sample_rate,
+                 result.trimmed_seconds, result.gain_db)
+    return result
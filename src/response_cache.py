@@ -0,0 +1,155 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from src.intent_router import default_directory, is_validated
+from src.logger import logger
+from src.metrics import RESPONSE_CACHE_REQUESTS
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Minimum word-overlap (Jaccard) for a differently worded question to reuse an answer; 0 disables
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+# Words that make a question depend on what was said before
+_CONTEXT_WORDS = frozenset("""
+    it its this that these those them they he she him her his hers there then again also too
+    above previous earlier before last same other else more yes no ok okay sure
+""".split())
+# Filler that does not change what is being asked
+_STOP_WORDS = frozenset("a an the please can could would will you your me my i is are do does to of for".split())
+# Answers that must not be replayed: failures, refusals and conversation endings
+_UNCACHEABLE_ANSWER = re.compile(r"\b(sorry|don't know|do not know|error|goodbye|bye)\b", re.IGNORECASE)
+
+
+def normalize_question(text):
+    """Lowercase, drop punctuation and collapse whitespace so trivially different wordings share a key."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(re.sub(r"[^\w\s:']", " ", text).split())
+
+
+def conversation_state(history, directory):
+    """
+    Fingerprint of the conversation state that changes how a question is answered.
+
+    The assistant asks for a customer ID before helping, so the same question gets a
+    different answer before and after a valid ID has been given.
+
+    Args:
+        history (str): The chat history as rendered into the prompt.
+        directory (CustomerDirectory): The valid customer IDs.
+
+    Returns:
+        str: "validated" or "unvalidated".
+    """
+    return "validated" if is_validated(history, directory) else "unvalidated"
+
+
+def is_cacheable(question, answer=None):
+    """
+    Decide whether a question (and its answer) may be served from the cache.
+
+    Only general questions qualify: a few words long, without numbers (customer IDs, dates,
+    times) and without references to earlier turns. Answers that apologise, fail or end the
+    conversation are never stored.
+    """
+    words = normalize_question(question).split()
+    if not 3 <= len(words) <= 20:
+        return False
+    if any(any(c.isdigit() for c in word) for word in words) or _CONTEXT_WORDS.intersection(words):
+        return False
+    if answer is not None and (not answer.strip() or _UNCACHEABLE_ANSWER.search(answer)):
+        return False
+    return True
+
+
+def _content_words(normalized):
+    return frozenset(normalized.split()) - _STOP_WORDS
+
+
+class ResponseCache:
+    """
+    LRU cache of LLM answers to context-independent questions, with TTL expiry.
+
+    Entries are keyed on the model, the conversation state fingerprint and the normalized
+    question. With `similarity` > 0, a miss falls back to the most similar cached question
+    of the same model and state whose word overlap reaches the threshold.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, similarity=RESPONSE_CACHE_SIMILARITY,
+                 directory=None):
+        self.directory = directory or default_directory()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries = OrderedDict()     # (model, state, question) -> (answer, content words, stored at)
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._entries:
+            _, (_, _, stored) = next(iter(self._entries.items()))
+            if now - stored <= self.ttl and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def _similar(self, model, state, words, now):
+        best, best_score = None, self.similarity
+        for (m, s, _), (answer, other, stored) in self._entries.items():
+            if m != model or s != state or now - stored > self.ttl or not other:
+                continue
+            score = len(words & other) / len(words | other)
+            if score >= best_score:
+                best, best_score = answer, score
+        return best
+
+    def get(self, question, history, model=""):
+        """
+        Return the cached answer for a question, or None.
+
+        Args:
+            question (str): The user's question.
+            history (str): The chat history the answer would be generated from.
+            model (str): The LLM the answer came from.
+        """
+        if not is_cacheable(question):
+            RESPONSE_CACHE_REQUESTS.labels("uncacheable").inc()
+            return None
+        normalized = normalize_question(question)
+        key = (model, conversation_state(history, self.directory), normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] <= self.ttl:
+                self._entries.move_to_end(key)
+                answer = entry[0]
+            else:
+                answer = None
+                if self.similarity > 0 and _content_words(normalized):
+                    answer = self._similar(model, key[1], _content_words(normalized), now)
+        RESPONSE_CACHE_REQUESTS.labels("hit" if answer is not None else "miss").inc()
+        if answer is not None:
+            logger.info("Response cache hit for %r", normalized)
+        return answer
+
+    def put(self, question, history, answer, model=""):
+        """Store an answer if the question and answer pass `is_cacheable`."""
+        if not is_cacheable(question, answer):
+            return
+        normalized = normalize_question(question)
+        key = (model, conversation_state(history, self.directory), normalized)
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (answer, _content_words(normalized), now)
+            self._evict(now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
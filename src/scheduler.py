@@ -0,0 +1,460 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from concurrent.futures import Future
+
+import groq
+
+from src.logger import logger
+from src.metrics import LLM_COALESCED, LLM_HEDGES, LLM_REJECTED, LLM_RETRIES, QUEUE_DEPTH
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))   # Longest a request may wait before it is turned away
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))          # Provider quotas; 0 disables the limit
+GROQ_TPM = float(os.getenv("GROQ_TPM", "30000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "250"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "4000"))
+LLM_HEDGE_MS = float(os.getenv("LLM_HEDGE_MS", "0"))   # Send a second copy of slow requests after this long; 0 disables
+
+INTERACTIVE = 0     # Voice turns a caller is waiting on
+BACKGROUND = 1      # Summaries and other work nobody is waiting on
+
+
+class Overloaded(Exception):
+    """The LLM scheduler turned a request away instead of letting it wait indefinitely."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(Overloaded):
+    """The request would exceed the provider's rate limits."""
+
+
+def is_retryable(error):
+    """True for errors worth retrying: rate limits, server errors, timeouts and dropped connections."""
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, groq.APIConnectionError)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`.
+
+    `take` reserves tokens up front and returns how long the caller must wait before using
+    them, so callers sleep outside the lock and are served in reservation order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount, max_wait=None):
+        """
+        Reserve `amount` tokens.
+
+        Returns:
+            float or None: Seconds to wait before the tokens are available, or None (and nothing
+            reserved) if that would be longer than `max_wait`.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (amount - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= amount
+            return wait
+
+    def refund(self, amount):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+class _Waiter:
+    """A request waiting for a concurrency slot, from a thread or from an event loop."""
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.entry = None       # Heap entry while queued
+        self.granted = False
+        self.abandoned = False
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def grant(self):
+        """Hand the slot over. Called with the gate lock held; False if the waiter is gone."""
+        if self.abandoned:
+            return False
+        if self.loop is None:
+            self.event.set()
+        else:
+            try:
+                self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+            except RuntimeError:    # Loop closed
+                return False
+        self.granted = True
+        return True
+
+
+class PriorityGate:
+    """
+    Bounded concurrency with a small priority queue in front, usable from threads and event loops.
+
+    At most `limit` holders run at a time. Others wait in priority order (then arrival order);
+    if `max_waiting` requests are already waiting, new ones are rejected straight away.
+    """
+
+    def __init__(self, limit, max_waiting):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self._active = 0
+        self._waiters = []      # Heap of (priority, sequence, waiter)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._depth = QUEUE_DEPTH.labels("llm_admission")
+
+    def _enter(self, priority, waiter):
+        """Take a slot if one is free, otherwise queue `waiter`. Returns True if a slot was taken."""
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return True
+            if len(self._waiters) >= self.max_waiting:
+                LLM_REJECTED.labels("queue_full").inc()
+                raise Overloaded("Too many LLM requests are waiting")
+            entry = (priority, next(self._sequence), waiter)
+            heapq.heappush(self._waiters, entry)
+            self._depth.inc()
+            waiter.entry = entry
+            return False
+
+    def _leave(self, waiter):
+        """Give up waiting. Returns True if the slot was granted in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.abandoned = True
+            self._waiters.remove(waiter.entry)
+            heapq.heapify(self._waiters)
+            self._depth.dec()
+            return False
+
+    def try_acquire(self):
+        """Take a slot only if one is free right now."""
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return True
+            return False
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """Wait for a slot in the calling thread; raises Overloaded after `timeout` seconds."""
+        waiter = _Waiter()
+        if self._enter(priority, waiter) or waiter.event.wait(timeout) or self._leave(waiter):
+            return
+        LLM_REJECTED.labels("queue_timeout").inc()
+        raise Overloaded("Timed out waiting for an LLM slot")
+
+    async def acquire_async(self, priority=INTERACTIVE, timeout=None):
+        """Wait for a slot without blocking the event loop; raises Overloaded after `timeout` seconds."""
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._enter(priority, waiter):
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if self._leave(waiter):
+                return
+            LLM_REJECTED.labels("queue_timeout").inc()
+            raise Overloaded("Timed out waiting for an LLM slot")
+        except asyncio.CancelledError:
+            if self._leave(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        """Free a slot, handing it straight to the highest-priority waiter if there is one."""
+        with self._lock:
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                self._depth.dec()
+                if waiter.grant():
+                    return
+            self._active -= 1
+
+
+class _LeaderCancelled(Exception):
+    """
+    The request that coalesced followers were waiting on was cancelled by its own caller.
+
+    Never reaches a caller: followers, sync or async, catch it and coalesce again, so one of
+    them leads a fresh request.
+    """
+
+
+class LLMScheduler:
+    """
+    Admission control in front of the LLM client.
+
+    Every call goes through:
+    - a priority gate bounding concurrent upstream requests (interactive turns first)
+    - request and token buckets matching the provider's RPM and TPM quotas
+    - retries with full-jitter exponential backoff on 429, 5xx and connection errors,
+      honouring Retry-After
+    - optionally, a hedged second request when the first is slower than `hedge_ms`
+      (async, non-streaming calls only, and only when a slot and quota are spare)
+    - coalescing of identical in-flight non-streaming requests
+
+    When a request cannot be served within `queue_timeout` seconds it fails fast with
+    Overloaded or RateLimited, so callers can shed load instead of piling up.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_queue=LLM_MAX_QUEUE,
+                 queue_timeout=LLM_QUEUE_TIMEOUT, rpm=GROQ_RPM, tpm=GROQ_TPM, max_retries=LLM_MAX_RETRIES,
+                 retry_base_ms=LLM_RETRY_BASE_MS, retry_max_ms=LLM_RETRY_MAX_MS, hedge_ms=LLM_HEDGE_MS):
+        self.gate = PriorityGate(max_concurrency, max_queue)
+        self.queue_timeout = queue_timeout
+        self.buckets = [(TokenBucket(rpm / 60, rpm), False)] if rpm else []
+        if tpm:
+            self.buckets.append((TokenBucket(tpm / 60, tpm), True))
+        self.max_retries = max_retries
+        self.retry_base = retry_base_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self.hedge_after = hedge_ms / 1000
+        self._inflight = {}     # Coalescing key -> concurrent.futures.Future
+        self._inflight_lock = threading.Lock()
+
+    def _reserve(self, tokens, max_wait):
+        """Reserve one request and `tokens` tokens; returns the wait in seconds, or None if too long."""
+        taken, wait = [], 0.0
+        for bucket, by_tokens in self.buckets:
+            amount = tokens if by_tokens else 1
+            bucket_wait = bucket.take(amount, max_wait)
+            if bucket_wait is None:
+                for other, other_amount in taken:
+                    other.refund(other_amount)
+                return None
+            taken.append((bucket, amount))
+            wait = max(wait, bucket_wait)
+        return wait
+
+    def _quota_wait(self, tokens):
+        wait = self._reserve(tokens, self.queue_timeout)
+        if wait is None:
+            LLM_REJECTED.labels("rate_limit").inc()
+            raise RateLimited("LLM rate limit reached", retry_after=self.queue_timeout)
+        return wait
+
+    def _backoff(self, attempt, error):
+        """Return the delay before retry `attempt`, or raise `error` if it should not be retried."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            if isinstance(error, groq.RateLimitError):
+                raise RateLimited("LLM provider rate limit reached", retry_after=_retry_after(error) or 1.0) from error
+            raise error
+        delay = _retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+        reason = str(getattr(error, "status_code", None) or type(error).__name__)
+        LLM_RETRIES.labels(reason).inc()
+        logger.warning("LLM request failed (%s), retry %d in %.2fs", reason, attempt + 1, delay)
+        return delay
+
+    def _coalesce(self, key):
+        """Return (future, is_leader) for a coalescing key."""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                LLM_COALESCED.inc()
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        if future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    # --- Blocking callers (Streamlit, background threads) ---
+
+    def call(self, fn, priority=INTERACTIVE, tokens=1, key=None):
+        """
+        Run `fn()` (one upstream request) under admission control, with retries.
+
+        Args:
+            fn (Callable): Makes the request; called again for every retry.
+            priority (int): INTERACTIVE or BACKGROUND.
+            tokens (int): Estimated prompt + completion tokens, for the TPM bucket.
+            key (Hashable, optional): Identical in-flight requests with the same key share one call.
+        """
+        if key is None:
+            return self._call(fn, priority, tokens)
+        while True:
+            future, leader = self._coalesce(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except _LeaderCancelled:
+                continue    # The leader's caller went away; one of the followers takes over
+        try:
+            result = self._call(fn, priority, tokens)
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            # KeyboardInterrupt and the like concern the leader's thread only
+            self._finish(key, future, error=_LeaderCancelled())
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def _call(self, fn, priority, tokens):
+        self.gate.acquire(priority, self.queue_timeout)
+        try:
+            for attempt in itertools.count():
+                time.sleep(self._quota_wait(tokens))
+                try:
+                    return fn()
+                except Exception as e:
+                    time.sleep(self._backoff(attempt, e))
+        finally:
+            self.gate.release()
+
+    def stream(self, make_stream, priority=INTERACTIVE, tokens=1):
+        """
+        Iterate a streamed request under admission control.
+
+        Failures before the first chunk are retried with a fresh `make_stream()`; once text has
+        been yielded, errors are raised to the caller.
+        """
+        self.gate.acquire(priority, self.queue_timeout)
+        try:
+            for attempt in itertools.count():
+                time.sleep(self._quota_wait(tokens))
+                started = False
+                try:
+                    for chunk in make_stream():
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started:
+                        raise
+                    time.sleep(self._backoff(attempt, e))
+        finally:
+            self.gate.release()
+
+    # --- Event loop callers (FastAPI) ---
+
+    async def acall(self, make_coro, priority=INTERACTIVE, tokens=1, key=None):
+        """Async version of `call`; `make_coro()` must return a new coroutine for every attempt."""
+        while key is not None:
+            future, leader = self._coalesce(key)
+            if leader:
+                break
+            try:
+                # Shielded: a follower that is cancelled must not cancel the future the others share
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                continue    # The leader's caller went away; one of the followers takes over
+        try:
+            result = await self._acall(make_coro, priority, tokens)
+        except Exception as e:
+            if key is not None:
+                self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            # Cancellation, KeyboardInterrupt and the like concern the leader's caller only
+            if key is not None:
+                self._finish(key, future, error=_LeaderCancelled())
+            raise
+        if key is not None:
+            self._finish(key, future, result)
+        return result
+
+    async def _acall(self, make_coro, priority, tokens):
+        await self.gate.acquire_async(priority, self.queue_timeout)
+        try:
+            for attempt in itertools.count():
+                await asyncio.sleep(self._quota_wait(tokens))
+                try:
+                    return await self._attempt(make_coro, tokens)
+                except Exception as e:
+                    await asyncio.sleep(self._backoff(attempt, e))
+        finally:
+            self.gate.release()
+
+    async def _attempt(self, make_coro, tokens):
+        if not self.hedge_after:
+            return await make_coro()
+        first = asyncio.ensure_future(make_coro())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+        # Hedge only with spare capacity, so hedging never delays someone else's request
+        if not self.gate.try_acquire():
+            return await first
+        if self._reserve(tokens, max_wait=0) is None:
+            self.gate.release()
+            return await first
+        LLM_HEDGES.inc()
+        tasks = [first, asyncio.ensure_future(make_coro())]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except Exception:
+                    if all(task.done() for task in tasks):
+                        raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.gate.release()
+
+    async def astream(self, make_stream, priority=INTERACTIVE, tokens=1):
+        """Async version of `stream`; `make_stream()` must return a new async iterator."""
+        await self.gate.acquire_async(priority, self.queue_timeout)
+        try:
+            for attempt in itertools.count():
+                await asyncio.sleep(self._quota_wait(tokens))
+                started = False
+                try:
+                    async for chunk in make_stream():
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started:
+                        raise
+                    await asyncio.sleep(self._backoff(attempt, e))
+        finally:
+            self.gate.release()
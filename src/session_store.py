@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import weakref
+from functools import partial
+from collections import OrderedDict
+
+from langchain_core.messages import messages_from_dict
+
+from src.history import TokenBudgetMemory
+from src.intent_router import default_directory
+from src.logger import logger
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")    # memory / sqlite
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(os.getcwd(), "sessions.db"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))    # Idle seconds before a session is dropped
+
+
+# The customer ID turn is pinned so validation survives the history being summarized
+_customers = default_directory()
+
+
+def new_memory():
+    """Create an empty conversation memory for a new session."""
+    return TokenBudgetMemory(pin=_customers.find)
+
+
+def dump_memory(memory):
+    """Serialize a conversation memory to a JSON string."""
+    return json.dumps(memory.to_dict())
+
+
+def load_memory(data):
+    """Rebuild a conversation memory from the output of `dump_memory`."""
+    data = json.loads(data)
+    if isinstance(data, list):
+        # Sessions saved before the token-budgeted memory: a list of LangChain message dicts
+        messages = messages_from_dict(data)
+        turns = [[q.content, a.content] for q, a in zip(messages[::2], messages[1::2])]
+        data = {"turns": turns}
+    return TokenBudgetMemory.from_dict(data, pin=_customers.find)
+
+
+class InMemorySessionStore:
+    """
+    Per-process conversation store: a bounded LRU of memories with idle TTL eviction.
+
+    At most `max_sessions` memories are held, so memory use stays flat however many
+    sessions have been seen. Sessions idle for longer than `ttl` seconds are dropped.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()     # session_id -> (memory, last_used)
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Oldest entries are at the front, so stop at the first one that is still fresh
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            logger.info("Evicted session %s", session_id)
+
+    def load(self, session_id):
+        """Return the memory for a session, creating an empty one if it is unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.pop(session_id, None)
+            memory = entry[0] if entry is not None else new_memory()
+            self._sessions[session_id] = (memory, now)
+            self._evict(now)
+        return memory
+
+    def save(self, session_id, memory):
+        """Store the memory for a session and mark it as recently used."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (memory, time.monotonic())
+            self._evict(time.monotonic())
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """
+    Conversation store shared by every worker process on the machine.
+
+    History is kept in a SQLite database in WAL mode, so `uvicorn --workers N` can serve any
+    session from any worker. Nothing is cached in-process; each request reads the latest state.
+
+    History summaries finish in the background, usually after the turn was saved, so a memory
+    saves itself again once its summary is in. That write only goes through if the row is still
+    the one this memory last saved, so it never overwrites a newer turn from another worker.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL, purge_every=100):
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        self._saved = weakref.WeakKeyDictionary()     # memory -> `updated` of its last save
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated REAL NOT NULL)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id):
+        """Return the memory for a session, creating an empty one if it is unknown or expired."""
+        row = self._connection().execute(
+            "SELECT messages, updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            memory = new_memory()
+        else:
+            memory = load_memory(row[0])
+            self._saved[memory] = row[1]
+        memory.on_summarized = partial(self._resave, session_id)
+        return memory
+
+    def save(self, session_id, memory):
+        """Persist the memory for a session."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("INSERT INTO sessions (id, messages, updated) VALUES (?, ?, ?) "
+                         "ON CONFLICT(id) DO UPDATE SET messages = excluded.messages, updated = excluded.updated",
+                         (session_id, dump_memory(memory), now))
+            self._saved[memory] = now
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+
+    def _resave(self, session_id, memory):
+        """Write a freshly summarized memory back, unless its session has moved on since it was saved."""
+        saved = self._saved.get(memory)
+        if saved is None:
+            return      # Not saved yet; its first save will include the summary
+        now = time.time()
+        with self._connection() as conn:
+            updated = conn.execute("UPDATE sessions SET messages = ?, updated = ? WHERE id = ? AND updated = ?",
+                                   (dump_memory(memory), now, session_id, saved)).rowcount
+        if updated:
+            self._saved[memory] = now
+
+    def delete(self, session_id):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(backend=SESSION_STORE):
+    """
+    Create the conversation store selected by the SESSION_STORE environment variable.
+
+    Args:
+        backend (str): 'memory' for a per-process LRU, 'sqlite' to share sessions across workers.
+
+    Returns:
+        InMemorySessionStore or SQLiteSessionStore
+    """
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown session store backend: {backend}")
+    return InMemorySessionStore()
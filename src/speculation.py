@@ -0,0 +1,140 @@
+import os
+import re
+import asyncio
+import threading
+
+from src.engine import GROQ_TIMEOUT, get_engine
+from src.logger import logger
+from src.metrics import SPECULATION_WASTED_TOKENS, SPECULATIONS
+
+SPECULATIVE_LLM = os.getenv("SPECULATIVE_LLM", "1") == "1"
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop():
+    """Return a process-wide event loop running in a daemon thread, for work started from sync code."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="background-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def normalize_transcript(text):
+    """Compare transcripts on their words only: case and punctuation differences do not count."""
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+def _history_version(memory):
+    """Return what a speculative answer depends on besides the question: the memory's version, or its history."""
+    version = getattr(memory, "version", None)
+    return version if version is not None else memory.load_memory_variables({})[memory.memory_key]
+
+
+class _Speculation:
+    def __init__(self, question, future, history):
+        self.question = question
+        self.key = normalize_transcript(question)
+        self.future = future
+        self.history = history      # `_history_version` of the memory the answer was built on
+        self.tokens = 0             # Estimated tokens, set once the request actually goes upstream
+        self.routed = False         # Whether the intent router looked at the question
+        self.route = None           # Its reply, counted in the routing metric only on a hit
+
+
+class SpeculativeResponder:
+    """
+    Starts the LLM request for a turn before the user has finished speaking.
+
+    Call `speculate` with the partial transcript when the endpointer reports that speech has
+    likely ended. The request runs on a background event loop without touching the conversation
+    memory. When the final transcript arrives, `take` returns the speculative answer if the
+    transcript matches and no turn has been recorded in the memory since (waiting for it if
+    needed) and records the turn; otherwise the request is cancelled and None tells the caller
+    to send the final transcript the normal way.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+        self.loop = get_background_loop()
+        self._current = None
+        self._lock = threading.Lock()
+
+    def speculate(self, question, memory):
+        """Start answering `question` in the background, replacing any earlier speculation."""
+        key = normalize_transcript(question)
+        if not key:
+            return
+        with self._lock:
+            if self._current is not None and self._current.key == key:
+                return
+            self._discard("superseded")
+            speculation = _Speculation(question, None, _history_version(memory))
+
+            def on_upstream(tokens):
+                speculation.tokens = tokens
+
+            def on_route(reply):
+                speculation.routed, speculation.route = True, reply
+
+            coro = self.engine.aanswer(question, memory, cache=False, on_upstream=on_upstream, on_route=on_route)
+            speculation.future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+            self._current = speculation
+        logger.info("Speculative LLM request for %r", key)
+
+    def take(self, question, memory, timeout=GROQ_TIMEOUT):
+        """
+        Return the speculative answer for the final transcript, or None if there is none.
+
+        On a hit the turn is committed to `memory`; on a miss the speculation is cancelled.
+        """
+        key = normalize_transcript(question)
+        with self._lock:
+            speculation, self._current = self._current, None
+        if speculation is None:
+            return None
+        if speculation.key != key:
+            self._waste(speculation, "miss")
+            return None
+        if speculation.history != _history_version(memory):
+            # A turn was recorded meanwhile (e.g. a reply cut off by a barge-in): the answer is stale
+            self._waste(speculation, "stale")
+            return None
+        try:
+            answer = speculation.future.result(timeout)
+        except Exception as e:
+            logger.warning("Speculative LLM request failed: %s", e)
+            speculation.future.cancel()
+            SPECULATIONS.labels("failed").inc()
+            return None
+        if speculation.history != _history_version(memory):
+            self._waste(speculation, "stale")
+            return None
+        SPECULATIONS.labels("hit").inc()
+        if speculation.routed:
+            self.engine.router.count(speculation.route)
+        self.engine.commit(memory, question, answer)
+        return answer
+
+    def cancel(self):
+        """Drop the current speculation, e.g. when the user kept talking or the turn was abandoned."""
+        with self._lock:
+            self._discard("cancelled")
+
+    def _discard(self, outcome):
+        """Cancel the current speculation. Lock held."""
+        if self._current is not None:
+            self._waste(self._current, outcome)
+            self._current = None
+
+    @staticmethod
+    def _waste(speculation, outcome):
+        speculation.future.cancel()
+        SPECULATIONS.labels(outcome).inc()
+        # Tokens the provider processed (or would have) for nothing
+        SPECULATION_WASTED_TOKENS.inc(speculation.tokens)
@@ -0,0 +1,247 @@
+import os
+import time
+import queue
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.audio import SAMPLE_RATE, pcm_to_float32
+from src.logger import logger
+from src.metrics import MeteredQueue, span
+from src.model_manager import model_manager
+from src.preprocess import AUDIO_PREPROCESS, preprocess
+
+ASR_STREAMING = os.getenv("ASR_STREAMING", "1") == "1"
+ASR_STEP_MS = int(os.getenv("ASR_STEP_MS", "500"))
+ASR_WINDOW_S = float(os.getenv("ASR_WINDOW_S", "10"))
+
+
+@dataclass
+class TranscriptEvent:
+    """A hypothesis for the utterance being spoken."""
+    text: str           # Committed text followed by the still-unstable tail
+    committed: str      # Prefix that will not change any more
+    is_final: bool
+    likely_end: bool = False    # Decoded after the speaker paused; probably the final text
+
+
+def _common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x.lower().strip(".,!?") != y.lower().strip(".,!?"):
+            break
+        n += 1
+    return n
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of one utterance with a local-agreement commit policy.
+
+    Every `update` re-decodes the audio window heard so far. Words on which two consecutive
+    hypotheses agree are committed and never revised. Once the window grows past
+    `max_window_s`, audio covered by committed segments is dropped from the front and the
+    committed text is passed as the prompt instead, so each decode stays bounded.
+    """
+
+    def __init__(self, model, max_window_s=ASR_WINDOW_S, decode_options=None, clean=AUDIO_PREPROCESS):
+        self.model = model
+        self.clean = clean
+        self.max_window = int(max_window_s * SAMPLE_RATE)
+        self.decode_options = {**model_manager.decode_options(model), **(decode_options or {})}
+        # Fallback temperatures of the final decode, capped by the model's profile
+        self.temperatures = model_manager.transcribe_options(model).get("temperature", (0.0, 0.2, 0.4))
+        self.reset()
+
+    def reset(self):
+        """Forget the current utterance."""
+        self._frozen = []       # Committed words whose audio has been dropped from the window
+        self._offset = 0        # Samples of the utterance dropped from the window
+        self._previous = []     # Last hypothesis for the current window
+        self._segments = []     # Its segments, timed from the start of the window
+        self._committed = 0     # Committed words of the current window
+
+    def _decode(self, audio, temperature):
+        prompt = " ".join(self._frozen[-50:]) or None
+        with model_manager.lock(self.model):
+            result = self.model.transcribe(audio, initial_prompt=prompt, condition_on_previous_text=False,
+                                           temperature=temperature, **self.decode_options)
+        return result["text"].split(), result["segments"]
+
+    def _event(self, words, is_final):
+        committed = self._frozen + words[:self._committed]
+        return TranscriptEvent(text=" ".join(self._frozen + words), committed=" ".join(committed),
+                               is_final=is_final)
+
+    def update(self, audio):
+        """
+        Re-decode the utterance heard so far.
+
+        Args:
+            audio (np.ndarray): float32 samples of the whole utterance so far.
+
+        Returns:
+            TranscriptEvent: The partial hypothesis.
+        """
+        window = audio[self._offset:]
+        # Greedy only: partials are redone anyway, so temperature fallback is not worth its cost
+        words, segments = self._decode(window, temperature=0.0)
+        agreed = _common_prefix(self._previous, words)
+        self._committed = min(max(self._committed, agreed), len(words))
+        self._previous, self._segments = words, segments
+        event = self._event(words, is_final=False)
+
+        if window.size > self.max_window:
+            self._slide()
+        return event
+
+    def _slide(self):
+        """Drop leading segments of the last hypothesis whose words are all committed."""
+        cut, cut_words, cut_time = 0, 0, 0.0
+        for segment in self._segments:
+            count = len(segment["text"].split())
+            if cut_words + count > self._committed:
+                break
+            cut += 1
+            cut_words += count
+            cut_time = segment["end"]
+        if cut_words:
+            self._frozen.extend(self._previous[:cut_words])
+            self._offset += int(cut_time * SAMPLE_RATE)
+            self._previous = self._previous[cut_words:]
+            self._segments = [dict(segment, start=segment["start"] - cut_time, end=segment["end"] - cut_time)
+                              for segment in self._segments[cut:]]
+            self._committed -= cut_words
+
+    def finish(self, audio):
+        """
+        Decode the rest of the utterance and commit everything.
+
+        Committed words are kept as they are: the audio of fully committed segments is not
+        decoded again, and only the words after the committed prefix come from the final decode.
+
+        Args:
+            audio (np.ndarray): float32 samples of the whole utterance.
+
+        Returns:
+            TranscriptEvent: The final transcript.
+        """
+        self._slide()
+        audio = audio[self._offset:]
+        if self.clean:
+            # Only the final decode is cleaned: partials rely on sample offsets into the raw window
+            audio = preprocess(audio).audio
+        words = self._decode(audio, temperature=self.temperatures)[0] if audio.size else []
+        words = self._previous[:self._committed] + words[self._committed:]
+        self._committed = len(words)
+        event = self._event(words, is_final=True)
+        self.reset()
+        return event
+
+
+def transcribe_stream(model, chunks, step_ms=ASR_STEP_MS):
+    """
+    Transcribe a stream of audio chunks, yielding partial hypotheses and then the final one.
+
+    Args:
+        model: The Whisper model.
+        chunks (Iterable[np.ndarray]): float32 16 kHz audio of a single utterance.
+        step_ms (int): Audio to accumulate between re-decodes.
+
+    Yields:
+        TranscriptEvent: Partial events while audio arrives, then one final event.
+    """
+    transcriber = StreamingTranscriber(model)
+    step = int(SAMPLE_RATE * step_ms / 1000)
+    audio = np.zeros(0, dtype=np.float32)
+    decoded = 0
+    for chunk in chunks:
+        audio = np.concatenate([audio, chunk])
+        if audio.size - decoded >= step:
+            decoded = audio.size
+            yield transcriber.update(audio)
+    yield transcriber.finish(audio)
+
+
+class StreamingASRStage:
+    """
+    ASR stage that transcribes speech from an AudioCapture while the user is still talking.
+
+    Every `step_ms` the utterance in progress is re-decoded and a partial TranscriptEvent is
+    put on `outputs`; when the endpointer closes the utterance, a final event follows. As soon
+    as the endpointer reports that speech has likely ended, an extra partial marked
+    `likely_end` is decoded so work on the reply can start before the utterance closes. It can
+    stand in for the PipelineStage returned by `transcribe_utterances`.
+    """
+
+    poll_interval = 0.03     # How quickly a pause in speech is noticed
+
+    def __init__(self, model, capture, step_ms=ASR_STEP_MS):
+        self.capture = capture
+        self.step = step_ms / 1000
+        self.transcriber = StreamingTranscriber(model)
+        self.outputs = MeteredQueue("asr_events")
+        self._processing = False
+        self._stopped = threading.Event()
+        self._last_size = 0
+        self._last_decode = 0.0
+        self._pause_decoded = False
+        self._thread = threading.Thread(target=self._run, name="asr-streaming", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                utterance = self.capture.utterances.get(timeout=self.poll_interval)
+            except queue.Empty:
+                utterance = None
+            # Only the final decode counts as busy; partials happen while the capture is in speech
+            self._processing = utterance is not None
+            try:
+                if utterance is not None:
+                    self._last_size = 0
+                    self._pause_decoded = False
+                    with span("transcription"):
+                        event = self.transcriber.finish(utterance)
+                    if event.text.strip():
+                        self.outputs.put(event)
+                else:
+                    self._partial()
+            except Exception as e:
+                logger.error("Streaming transcription failed: %s", e)
+                self.transcriber.reset()
+            finally:
+                self._processing = False
+
+    def _partial(self):
+        likely_end = self.capture.endpointer.likely_ended
+        if not likely_end:
+            self._pause_decoded = False
+        pause = likely_end and not self._pause_decoded
+        if not pause and time.monotonic() - self._last_decode < self.step:
+            return
+        audio = self.capture.endpointer.buffered()
+        if audio is None or audio.size == self._last_size:
+            return
+        self._last_size = audio.size
+        self._last_decode = time.monotonic()
+        event = self.transcriber.update(pcm_to_float32(audio))
+        event.likely_end = likely_end
+        self._pause_decoded = self._pause_decoded or likely_end
+        if event.text.strip():
+            self.outputs.put(event)
+
+    @property
+    def busy(self):
+        return self._processing or not self.capture.utterances.empty()
+
+    def get(self, timeout=None):
+        """Return the next TranscriptEvent, or None if none arrived within `timeout` seconds."""
+        try:
+            return self.outputs.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,227 @@
+import re
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from src.audio import read_wav_bytes
+from src.audio_sink import AudioSink
+from src.tts_backends import create_backend
+from src.logger import logger
+from src.metrics import MeteredQueue, observe, span
+
+# Sentence ends (optionally followed by closing quotes/brackets), clause separators and newlines
+_BOUNDARY = re.compile(r'[.!?]+["\')\]]*(?=\s)|[,;:](?=\s)|\n')
+
+
+class SegmentSplitter:
+    """
+    Incremental splitter of text into speakable segments at sentence and clause boundaries.
+
+    Commas, semicolons and colons only split once the segment is at least `min_clause_chars`
+    long, to avoid choppy audio. Feed it text pieces as they arrive and flush it at the end.
+    """
+
+    def __init__(self, min_clause_chars=20):
+        self.min_clause_chars = min_clause_chars
+        self.buffer = ""
+
+    def feed(self, chunk):
+        """Add a text piece and return the segments it completed, stripped and non-empty."""
+        self.buffer += chunk
+        segments = []
+        start = 0
+        for match in _BOUNDARY.finditer(self.buffer):
+            segment = self.buffer[start:match.end()].strip()
+            is_clause = match.group()[0] in ",;:"
+            if not segment or (is_clause and len(segment) < self.min_clause_chars):
+                continue
+            segments.append(segment)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return segments
+
+    def flush(self):
+        """Return the text left after the last boundary as a final segment, if any."""
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def split_segments(chunks, min_clause_chars=20):
+    """
+    Split a stream of text into speakable segments at sentence and clause boundaries.
+
+    Segments are yielded as soon as their boundary has arrived, so the first sentence can be
+    synthesized while the rest of the text is still being generated.
+
+    Args:
+        chunks (Iterable[str]): Text pieces, e.g. tokens streamed from the LLM.
+        min_clause_chars (int): Minimum length of a segment ending at a clause boundary.
+
+    Yields:
+        str: Stripped, non-empty text segments in order.
+    """
+    splitter = SegmentSplitter(min_clause_chars)
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.flush()
+
+
+class SpeechPipeline:
+    """
+    Text-to-speech pipeline that starts speaking before the full reply is available.
+
+    Incoming text is split into sentences and clauses. A synthesis worker converts
+    segment N+1 while segment N is playing, and finished segments are queued on a
+    persistent audio sink so they play back to back without gaps.
+
+    One pipeline is shared by every conversation of the process and speaks one reply at a
+    time. A reply can be tagged with an `owner`, e.g. a session id, so that conversation can
+    only interrupt its own reply.
+    """
+
+    def __init__(self, backend=None, sink=None, cache=None, language='en', slow=False):
+        """
+        Args:
+            backend (TTSBackend, optional): Synthesizer to use. Defaults to the TTS_BACKEND setting.
+            sink (AudioSink, optional): Where audio is played. Defaults to the system output device.
+            cache (TTSCache, optional): Cache of synthesized phrases; hits skip synthesis entirely.
+            language (str): Default language of the text.
+            slow (bool): Whether to slow down the speech by default.
+        """
+        self.backend = backend or create_backend()
+        self.sink = sink or AudioSink(sample_rate=self.backend.sample_rate)
+        self.cache = cache
+        self.language = language
+        self.slow = slow
+        # A single worker keeps the segments in order while still running ahead of playback
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-synth")
+        self._lock = threading.Lock()
+        self._interrupted = threading.Event()
+        self.speaking = False
+        self.owner = None           # Owner of the reply being spoken
+        self.interrupted = False    # Whether the last reply was cut off by `interrupt`
+        self._cut_off = {}          # Owner -> whether their last reply was interrupted, until read
+
+    def speak(self, chunks, language=None, slow=None, owner=None):
+        """
+        Speak a stream of text, blocking until the last segment has been played.
+
+        Args:
+            chunks (Iterable[str]): Text pieces; a list with the full reply works too.
+            language (str, optional): Overrides the pipeline language for this reply.
+            slow (bool, optional): Overrides the pipeline speed for this reply.
+            owner (Hashable, optional): Who the reply is spoken for; see `interrupt` and `was_interrupted`.
+
+        Returns:
+            str: The complete text that was spoken, or generated before the reply was interrupted.
+        """
+        language = language or self.language
+        slow = self.slow if slow is None else slow
+        spoken = []
+
+        def consume():
+            # Runs in the caller's thread so generators with side effects (e.g. UI updates) stay there
+            try:
+                for chunk in chunks:
+                    if self._interrupted.is_set():
+                        break
+                    spoken.append(chunk)
+                    yield chunk
+            finally:
+                if hasattr(chunks, "close"):
+                    # Stops the LLM stream behind the chunks, if any
+                    chunks.close()
+
+        with self._lock:
+            self._interrupted.clear()
+            self.interrupted = False
+            self.owner = owner
+            self.speaking = True
+            pending = MeteredQueue("tts_segments")
+            # Worker threads get a copy of the caller's context so their spans carry the turn id
+            player = threading.Thread(target=contextvars.copy_context().run, args=(self._playback, pending),
+                                      daemon=True)
+            player.start()
+            try:
+                for segment in split_segments(consume()):
+                    pending.put(self._executor.submit(contextvars.copy_context().run, self._synthesize, segment,
+                                                      language, slow))
+            finally:
+                pending.put(None)
+                player.join()
+                self.speaking = False
+                self.owner = None
+                if owner is not None:
+                    self._cut_off[owner] = self.interrupted
+        return "".join(spoken)
+
+    def interrupt(self, owner=None):
+        """
+        Cut off the reply being spoken: playback stops at once, segments not yet played are
+        dropped and no more text is read from the reply's chunks. `speak` then returns.
+
+        Args:
+            owner (Hashable, optional): Only interrupt the reply if it is spoken for this owner.
+
+        Returns:
+            bool: Whether a reply was interrupted.
+        """
+        if not self.speaking or (owner is not None and owner != self.owner):
+            return False
+        self.interrupted = True
+        self._interrupted.set()
+        self.sink.stop()
+        return True
+
+    def was_interrupted(self, owner):
+        """Return whether the last reply spoken for `owner` was interrupted; answers once per reply."""
+        return self._cut_off.pop(owner, False)
+
+    def synthesize(self, text, language=None, slow=None):
+        """Synthesize one segment to WAV bytes (through the cache) without playing it."""
+        return self._synthesize(text, language or self.language, self.slow if slow is None else slow)
+
+    def _synthesize(self, text, language, slow):
+        with span("tts_synthesis"):
+            if self.cache is None:
+                return self.backend.synthesize(text, language, slow)
+            return self.cache.get_or_synthesize(text, self.backend, language=language, slow=slow)
+
+    def preload(self, phrases):
+        """Synthesize known phrases into the cache ahead of time."""
+        if self.cache is not None:
+            self.cache.preload(phrases, self.backend, language=self.language, slow=self.slow)
+
+    def _playback(self, pending):
+        """Queue synthesized segments on the sink in order, then wait for the last one to finish."""
+        done = None
+        started = None
+        while True:
+            future = pending.get()
+            if future is None:
+                break
+            if self._interrupted.is_set():
+                future.cancel()
+                continue
+            try:
+                samples, sample_rate = read_wav_bytes(future.result())
+            except Exception as e:
+                logger.error("Speech synthesis failed: %s", e)
+                continue
+            if self._interrupted.is_set():
+                continue
+            done = self.sink.play(samples, sample_rate)
+            if self._interrupted.is_set():
+                # Interrupted while this segment was being queued
+                self.sink.stop()
+            if started is None:
+                started = time.perf_counter()
+        if done is not None:
+            done.wait()
+            observe("playback", time.perf_counter() - started)
+
+    def close(self):
+        """Stop the synthesis worker and release the audio device."""
+        self._executor.shutdown(wait=False)
+        self.sink.close()
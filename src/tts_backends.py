@@ -0,0 +1,108 @@
+import io
+import os
+import shutil
+import subprocess
+
+import ffmpeg    # To decode MP3 in memory
+from gtts import gTTS    # For text-to-speech
+
+from src.audio import pcm_to_int16, to_wav_bytes, read_wav_bytes, resample
+
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")      # gtts / espeak
+TTS_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", "24000"))
+
+
+class TTSBackend:
+    """
+    Interface for speech synthesizers.
+
+    A backend turns text into 16-bit mono WAV bytes at `sample_rate`, which the speech pipeline
+    caches and plays from memory. `voice` identifies everything besides the text that changes
+    the audio, so it can be part of the cache key.
+    """
+    name = "base"
+    sample_rate = TTS_SAMPLE_RATE
+
+    @property
+    def voice(self):
+        return self.name
+
+    def synthesize(self, text, language='en', slow=False):
+        """
+        Args:
+            text (str): The text to speak.
+            language (str): Language of the text.
+            slow (bool): Whether to slow down the speech.
+
+        Returns:
+            bytes: 16-bit mono WAV audio.
+        """
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate text-to-speech (needs network access)."""
+    name = "gtts"
+
+    def __init__(self, tld='com.au', sample_rate=TTS_SAMPLE_RATE):
+        self.tld = tld
+        self.sample_rate = sample_rate
+
+    @property
+    def voice(self):
+        return f"{self.name}:{self.tld}"
+
+    def synthesize(self, text, language='en', slow=False):
+        fp = io.BytesIO()
+        gTTS(text=text, lang=language, slow=slow, tld=self.tld).write_to_fp(fp)
+        # gTTS only produces MP3; decode it to PCM through pipes so playback needs no decoder
+        pcm, _ = (
+            ffmpeg.input("pipe:0")
+            .output("pipe:1", format="s16le", ac=1, ar=self.sample_rate)
+            .run(input=fp.getvalue(), capture_stdout=True, capture_stderr=True)
+        )
+        return to_wav_bytes(pcm_to_int16(pcm), self.sample_rate)
+
+
+class EspeakBackend(TTSBackend):
+    """Offline synthesis with the local espeak-ng engine."""
+    name = "espeak"
+
+    def __init__(self, voice=None, words_per_minute=175, sample_rate=TTS_SAMPLE_RATE):
+        self.executable = shutil.which("espeak-ng") or shutil.which("espeak")
+        if self.executable is None:
+            raise RuntimeError("TTS_BACKEND=espeak needs espeak-ng installed (apt-get install espeak-ng)")
+        self.voice_name = voice
+        self.words_per_minute = words_per_minute
+        self.sample_rate = sample_rate
+
+    @property
+    def voice(self):
+        return f"{self.name}:{self.voice_name or 'default'}:{self.words_per_minute}"
+
+    def synthesize(self, text, language='en', slow=False):
+        speed = int(self.words_per_minute * (0.7 if slow else 1.0))
+        result = subprocess.run(
+            # "--" ends the options, so a reply starting with "-" is spoken rather than parsed
+            [self.executable, "--stdout", "-v", self.voice_name or language, "-s", str(speed), "--", text],
+            capture_output=True, check=True,
+        )
+        samples, rate = read_wav_bytes(result.stdout)
+        return to_wav_bytes(resample(samples, rate, self.sample_rate), self.sample_rate)
+
+
+def create_backend(name=TTS_BACKEND):
+    """
+    Create the TTS backend selected by the TTS_BACKEND environment variable.
+
+    Args:
+        name (str): 'gtts' (online, default) or 'espeak' (offline).
+
+    Returns:
+        TTSBackend
+    """
+    if name == "gtts":
+        return GTTSBackend()
+    if name == "espeak":
+        return EspeakBackend()
+    raise ValueError(f"Unknown TTS backend: {name}")
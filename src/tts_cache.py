@@ -0,0 +1,210 @@
+import os
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from src.logger import logger
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.getcwd(), "tts_cache"))
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "256"))     # 0 disables the disk tier
+TTS_PRELOAD_FILE = os.getenv("TTS_PRELOAD_FILE")                      # One phrase per line
+
+
+def normalize_text(text):
+    """Normalize text so trivially different spellings of a phrase share one cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(text, language='en', voice='gtts:com.au', slow=False):
+    """Return the content address of a synthesized phrase."""
+    raw = "\x00".join([normalize_text(text), language, voice, "slow" if slow else "normal"])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two-tier, content-addressed cache of synthesized speech.
+
+    Entries are keyed by a hash of the normalized text, language, voice (the backend and its
+    settings, e.g. the gTTS tld) and speed. A bounded in-memory LRU sits in front of a bounded
+    directory of audio files; both tiers evict the least recently used entries when they
+    exceed their byte budget. Files are read, written and removed outside the lock, so a slow
+    disk never holds up lookups served from memory.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, memory_bytes=int(TTS_CACHE_MEMORY_MB * 1024 * 1024),
+                 disk_bytes=int(TTS_CACHE_DISK_MB * 1024 * 1024)):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()   # key -> audio bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()     # key -> file size
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.preloaded = 0          # Phrases synthesized by `preload`; not counted as misses
+
+        if self.disk_bytes > 0:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".audio")
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from file modification times."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".audio"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._remove(self._evict_disk())
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _evict_disk(self):
+        """Drop the least recently used files from the index until it fits; returns their paths. Lock held."""
+        evicted = []
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(self._path(key))
+        return evicted
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _lookup(self, key):
+        """Return (audio, tier) for a key, or (None, None); files are read outside the lock."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data, "memory"
+            if key not in self._disk:
+                return None, None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            # Evicted or removed in the meantime
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+            return None, None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._remember(key, data)
+        return data, "disk"
+
+    def get(self, key):
+        """Return cached audio for a key, or None on a miss."""
+        data, tier = self._lookup(key)
+        with self._lock:
+            if tier == "memory":
+                self.hits_memory += 1
+            elif tier == "disk":
+                self.hits_disk += 1
+            else:
+                self.misses += 1
+        return data
+
+    def put(self, key, data):
+        """Store audio in both tiers."""
+        with self._lock:
+            self._remember(key, data)
+        if self.disk_bytes <= 0 or len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write TTS cache entry %s: %s", key, e)
+            return
+        with self._lock:
+            self._disk_size -= self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._disk_size += len(data)
+            evicted = self._evict_disk()
+        self._remove(evicted)
+
+    def get_or_synthesize(self, text, backend, language='en', slow=False):
+        """
+        Return speech for the text from the cache, synthesizing and storing it on a miss.
+
+        Args:
+            text (str): The text to speak.
+            backend (TTSBackend): Synthesizer used on a miss; its voice is part of the key.
+            language (str): Language of the text.
+            slow (bool): Whether the speech is slowed down.
+
+        Returns:
+            bytes: The synthesized audio.
+        """
+        key = cache_key(text, language, backend.voice, slow)
+        data = self.get(key)
+        if data is None:
+            data = backend.synthesize(text, language, slow)
+            self.put(key, data)
+        return data
+
+    def preload(self, phrases, backend, language='en', slow=False):
+        """Make sure every phrase is cached, synthesizing the missing ones (counted as `preloaded`, not as misses)."""
+        for phrase in phrases:
+            key = cache_key(phrase, language, backend.voice, slow)
+            try:
+                if self._lookup(key)[0] is None:
+                    self.put(key, backend.synthesize(phrase, language, slow))
+                    with self._lock:
+                        self.preloaded += 1
+            except Exception as e:
+                logger.warning("Could not preload TTS phrase %r: %s", phrase, e)
+        logger.info("TTS cache preloaded: %s", self.stats())
+
+    def stats(self):
+        """Return hit/miss counters and the size of both tiers."""
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "preloaded": self.preloaded,
+            "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_size,
+        }
+
+
+def read_phrases(path):
+    """Read one phrase per line, skipping blank lines and '#' comments."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
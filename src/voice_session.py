@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import asyncio
+import threading
+
+import numpy as np
+from starlette.websockets import WebSocketDisconnect
+
+from src.audio import SAMPLE_RATE, pcm_to_float32, pcm_to_int16, read_wav_bytes, resample
+from src.capture import BARGE_IN
+from src.endpointer import Endpointer
+from src.engine import get_engine
+from src.logger import logger
+from src.metrics import BARGE_INS, VOICE_SESSIONS, observe, turn_context
+from src.scheduler import Overloaded
+from src.tts import SegmentSplitter
+
+VOICE_MAX_SESSIONS = int(os.getenv("VOICE_MAX_SESSIONS", "64"))
+VOICE_INBOUND_QUEUE = int(os.getenv("VOICE_INBOUND_QUEUE", "64"))      # Audio messages buffered per call
+VOICE_PENDING_TURNS = int(os.getenv("VOICE_PENDING_TURNS", "2"))       # Utterances waiting for a reply
+VOICE_AUDIO_CHUNK_MS = int(os.getenv("VOICE_AUDIO_CHUNK_MS", "200"))   # Size of the audio messages sent back
+
+_FLUSH = object()
+
+
+class SessionSlots:
+    """Counts the voice sessions of this process and turns new ones away above `limit`."""
+
+    def __init__(self, limit=VOICE_MAX_SESSIONS):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+        VOICE_SESSIONS.inc()
+        return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        VOICE_SESSIONS.dec()
+
+
+class VoiceSession:
+    """
+    One full-duplex voice call over a WebSocket.
+
+    The client streams little-endian 16-bit mono PCM as binary messages; a text message
+    `{"type": "flush"}` ends the current utterance without waiting for silence. The server
+    sends JSON events (`session`, `speech_start`, `speech_end`, `transcript`, `reply`, `audio`,
+    `barge_in`, `turn_end`, `error`) and, after each `audio` event, the synthesized speech of
+    one reply segment as binary int16 PCM messages at the event's `sample_rate`.
+
+    When the caller starts speaking while a reply is still being generated or (by the server's
+    estimate) played, the reply is cancelled, LLM stream included, and `barge_in` tells the
+    client to drop the audio it has buffered. Echo cancellation is up to the client, e.g. the
+    browser's `echoCancellation` constraint.
+
+    Three tasks run per call: the receiver, the endpointer and the conversation. They are
+    joined by bounded queues, so a call that produces audio faster than it is transcribed
+    stops being read, and TCP pushes back on the client; on the way out, each send waits for
+    the socket to drain and synthesis runs at most two segments ahead of it. Transcription
+    goes through the shared batch transcriber and the LLM through the shared scheduler, so
+    concurrent calls share one model and one Groq quota.
+    """
+
+    def __init__(self, websocket, store, session_id, transcriber, speech, sample_rate=SAMPLE_RATE, endpointer=None):
+        """
+        Args:
+            websocket (starlette.websockets.WebSocket): The accepted connection.
+            store: Session store holding the conversation memory.
+            session_id (str): Session the call belongs to.
+            transcriber (BatchTranscriber): Shared transcriber.
+            speech (SpeechPipeline): Provides the TTS backend and cache; nothing is played locally.
+            sample_rate (int): Sample rate of the client's audio; resampled to 16 kHz if different.
+            endpointer (Endpointer, optional): Per-call endpointer; a default one is created if omitted.
+        """
+        self.websocket = websocket
+        self.store = store
+        self.session_id = session_id
+        self.transcriber = transcriber
+        self.speech = speech
+        self.sample_rate = sample_rate
+        self.endpointer = endpointer or Endpointer()
+        self.engine = get_engine()
+        self.memory = None
+        self._inbound = asyncio.Queue(maxsize=VOICE_INBOUND_QUEUE)
+        self._utterances = asyncio.Queue(maxsize=VOICE_PENDING_TURNS)
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._send_lock = asyncio.Lock()
+        self._reply_task = None
+        self._barged_in = False
+        self._playing_until = 0.0   # When the client should finish playing the audio sent so far
+
+    async def run(self):
+        """Serve the call until the client disconnects."""
+        self.memory = await asyncio.to_thread(self.store.load, self.session_id)
+        await self.send_event("session", session_id=self.session_id)
+        logger.info("Voice session %s started", self.session_id)
+        tasks = [asyncio.create_task(self._receive()), asyncio.create_task(self._segment()),
+                 asyncio.create_task(self._converse())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is not None and not isinstance(error, WebSocketDisconnect):
+                    logger.error("Voice session %s failed: %s", self.session_id, error)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.to_thread(self.store.save, self.session_id, self.memory)
+            logger.info("Voice session %s ended", self.session_id)
+
+    async def send_event(self, event, **fields):
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps({"type": event, **fields}))
+
+    async def _receive(self):
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                # Waits while the call is behind, which stops reading from the socket
+                await self._inbound.put(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    control = {}
+                if control.get("type") == "flush":
+                    await self._inbound.put(_FLUSH)
+                else:
+                    await self.send_event("error", detail=f"Unknown message: {message['text'][:100]}")
+
+    async def _segment(self):
+        frame_length = self.endpointer.frame_length
+        endpointing = 0.0
+        onset = None
+        while True:
+            data = await self._inbound.get()
+            received = time.perf_counter()
+            if data is _FLUSH:
+                segments = [self.endpointer.flush()]
+            else:
+                samples = pcm_to_int16(data)
+                if self.sample_rate != SAMPLE_RATE:
+                    samples = resample(samples, self.sample_rate, SAMPLE_RATE)
+                self._pending = np.concatenate([self._pending, samples])
+                usable = self._pending.size - self._pending.size % frame_length
+                frames, self._pending = self._pending[:usable], self._pending[usable:]
+                segments = []
+                was_triggered = self.endpointer.triggered
+                start = time.perf_counter()
+                for frame in frames.reshape(-1, frame_length):
+                    segments.append(self.endpointer.process(frame))
+                endpointing += time.perf_counter() - start
+                if self.endpointer.triggered and not was_triggered:
+                    onset = received
+                    await self._speech_started()
+            for segment in segments:
+                if segment is not None:
+                    # From the message that started the utterance until the endpointer closed it
+                    observe("capture", time.perf_counter() - (onset or received))
+                    observe("silence_check", endpointing)
+                    endpointing = 0.0
+                    onset = None
+                    await self.send_event("speech_end", seconds=segment.size / SAMPLE_RATE)
+                    await self._utterances.put(pcm_to_float32(segment))
+
+    async def _speech_started(self):
+        replying = self._reply_task is not None and not self._reply_task.done()
+        if BARGE_IN and (replying or time.monotonic() < self._playing_until):
+            BARGE_INS.inc()
+            logger.info("Barge-in on voice session %s", self.session_id)
+            if replying:
+                self._barged_in = True
+                self._reply_task.cancel()
+            self._playing_until = 0.0
+            await self.send_event("barge_in")
+        await self.send_event("speech_start")
+
+    async def _converse(self):
+        while True:
+            audio = await self._utterances.get()
+            with turn_context(self.session_id):
+                try:
+                    await self._turn(audio)
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    # A failed turn is reported; the call itself goes on
+                    logger.error("Voice turn failed for session %s: %s", self.session_id, e)
+                    await self.send_event("error", detail=str(e))
+
+    async def _turn(self, audio):
+        text = (await self.transcriber.transcribe(audio)).strip()
+        await self.send_event("transcript", text=text, final=True)
+        if not text:
+            return
+        self._barged_in = False
+        self._reply_task = asyncio.create_task(self._reply(text))
+        try:
+            await self._reply_task
+        except asyncio.CancelledError:
+            if not self._barged_in:
+                raise
+        except Overloaded as e:
+            logger.warning("Voice turn turned away for session %s: %s", self.session_id, e)
+            await self.send_event("error", detail=str(e), retry_after=e.retry_after)
+            return
+        finally:
+            self._reply_task = None
+        # An interrupted reply is recorded up to where it was cut off
+        await asyncio.to_thread(self.store.save, self.session_id, self.memory)
+        await self.send_event("turn_end", interrupted=self._barged_in)
+
+    async def _reply(self, question):
+        """Stream the answer as text events and synthesized audio, segment by segment."""
+        splitter = SegmentSplitter()
+        segments = asyncio.Queue(maxsize=2)     # Synthesis jobs running ahead of the audio being sent
+        sender = asyncio.create_task(self._send_audio(segments))
+        stream = self.engine.astream(question, self.memory)
+        try:
+            async for chunk in stream:
+                await self.send_event("reply", text=chunk)
+                for segment in splitter.feed(chunk):
+                    await segments.put(self._synthesize(segment))
+            for segment in splitter.flush():
+                await segments.put(self._synthesize(segment))
+            await segments.put(None)
+            await sender
+        finally:
+            sender.cancel()
+            # Ends the LLM request right away when the reply is cancelled
+            await stream.aclose()
+
+    def _synthesize(self, text):
+        # to_thread copies the context, so the synthesis span carries the turn id
+        return text, asyncio.ensure_future(asyncio.to_thread(self.speech.synthesize, text))
+
+    async def _send_audio(self, segments):
+        while True:
+            item = await segments.get()
+            if item is None:
+                return
+            text, job = item
+            try:
+                samples, sample_rate = read_wav_bytes(await job)
+            except Exception as e:
+                logger.error("Speech synthesis failed: %s", e)
+                continue
+            step = max(1, sample_rate * VOICE_AUDIO_CHUNK_MS // 1000)
+            self._playing_until = max(self._playing_until, time.monotonic()) + samples.size / sample_rate
+            async with self._send_lock:
+                await self.websocket.send_text(json.dumps({"type": "audio", "text": text, "sample_rate": sample_rate,
+                                                           "samples": int(samples.size)}))
+                for start in range(0, samples.size, step):
+                    await self.websocket.send_bytes(samples[start:start + step].tobytes())
@@ -1,20 +1,24 @@
 import os
+import time
+import threading
 from dotenv import load_dotenv
 
-import wave  # To access files
-import pyaudio  # To play & record audio
 import numpy as np
-from scipy.io import wavfile    # To access files
 
 from langchain_groq import ChatGroq     # For LLM
-from langchain.chains.llm import LLMChain       # For LLM to create chain
-from langchain_core.prompts import PromptTemplate
-
-import pygame    # For text-to-speech audio playback
-import whisper  # For speech-to-text
-from gtts import gTTS    # For text-to-speech
 
 from src.logger import logger
+from src.metrics import BARGE_INS, observe, span
+from src.capture import BARGE_IN_ECHO_GATE
+from src.endpointer import Endpointer
+from src.audio import pcm_to_float32, write_wav
+from src.model_manager import model_manager     # For speech-to-text
+from src.preprocess import AUDIO_PREPROCESS, preprocess
+from src.engine import INPUT_PROMPT, GROQ_MODEL_NAME, get_engine
+from src.pipeline import PipelineStage
+from src.streaming_asr import ASR_STREAMING, StreamingASRStage, TranscriptEvent
+from src.tts import SpeechPipeline     # For text-to-speech
+from src.tts_cache import TTSCache, TTS_PRELOAD_FILE, read_phrases
 
 load_dotenv()
 
@@ -28,53 +32,139 @@ def is_silence(data, max_amplitude_threshold=3000):
     return max_amplitude <= max_amplitude_threshold
 
 
-def record_audio_chunk(audio, stream, chunk_length=5):
+def record_speech(stream, chunk_length=5, endpointer=None):
     """
-    Record an audio chunk from the provided stream for a specified length and check for silence.
+    Read frames from the stream until the endpointer returns a complete utterance.
 
     Parameters:
-    - audio: The audio object to access audio properties.
     - stream: The stream object to read audio data from.
-    - chunk_length: The length of the audio chunk to record.
+    - chunk_length: How long to wait (in seconds) for speech to start before giving up.
+    - endpointer: Optional Endpointer instance; a default one is created if omitted.
 
     Returns:
-    - True if the recorded chunk contains silence, False otherwise.
+    - The int16 speech segment, or None if no speech started within chunk_length.
     """
     print("Recording...")
-    frames = []
-    # Calculate the number of chunks needed for the specified length of recording
+    endpointer = endpointer or Endpointer()
     # 16000 Hertz -> sufficient for capturing the human voice
-    # 1024 frames -> the higher, the higher the latency
-    num_chunks = int(16000 / 1024 * chunk_length)
+    # Short frames (30 ms by default) -> the end of speech is noticed quickly
+    frame_length = endpointer.frame_length
+    max_idle_frames = int(16000 / frame_length * chunk_length)
+
+    segment = None
+    idle_frames = 0
+    endpointing = 0.0
+    with span("capture"):
+        while segment is None:
+            data = stream.read(frame_length, exception_on_overflow=False)
+            start = time.perf_counter()
+            segment = endpointer.process(np.frombuffer(data, dtype=np.int16))
+            endpointing += time.perf_counter() - start
+            if not endpointer.triggered:
+                idle_frames += 1
+                if idle_frames >= max_idle_frames:
+                    break
+    observe("silence_check", endpointing)
+    return segment
+
+
+def record_audio(stream, chunk_length=5, endpointer=None):
+    """
+    Record one utterance and return it in memory, ready for `transcribe_audio`.
+
+    Parameters:
+    - stream: The stream object to read audio data from.
+    - chunk_length: How long to wait (in seconds) for speech to start before giving up.
+    - endpointer: Optional Endpointer instance; a default one is created if omitted.
+
+    Returns:
+    - float32 samples normalized to [-1, 1], or None if no speech was detected.
+    """
+    segment = record_speech(stream, chunk_length=chunk_length, endpointer=endpointer)
+    if segment is None:
+        return None
+    return pcm_to_float32(segment)
+
+
+def record_audio_chunk(audio, stream, chunk_length=5, endpointer=None, file_path='./temp_audio_chunk.wav'):
+    """
+    Record one utterance from the provided stream to a WAV file and check for silence.
+
+    Kept for callers that work with files; prefer `record_audio`, which skips the disk.
+
+    Parameters:
+    - audio: The audio object to access audio properties.
+    - stream: The stream object to read audio data from.
+    - chunk_length: How long to wait (in seconds) for speech to start before giving up.
+    - endpointer: Optional Endpointer instance; a default one is created if omitted.
+    - file_path: Where to write the recorded utterance.
 
-    # Record the audio data in chunks
-    for _ in range(num_chunks):
-        data = stream.read(1024)
-        frames.append(data)
+    Returns:
+    - True if no speech was detected, False otherwise.
+    """
+    segment = record_speech(stream, chunk_length=chunk_length, endpointer=endpointer)
+    if segment is None:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return True
 
-    temp_file_path = './temp_audio_chunk.wav'
     print("Writing...")
-    with wave.open(temp_file_path, 'wb') as wf:
-        wf.setnchannels(1)  # Mono channel
-        wf.setsampwidth(audio.get_sample_size(pyaudio.paInt16))  # Sample width
-        wf.setframerate(16000)  # Sample rate
-        wf.writeframes(b''.join(frames))  # Write audio frames
+    write_wav(file_path, segment)
+    return False
+
+
+def transcribe_utterances(model, capture, streaming=ASR_STREAMING):
+    """
+    Start a background ASR stage that transcribes utterances as the capture produces them.
+
+    Parameters:
+    - model: The Whisper model used for transcription.
+    - capture: A started AudioCapture.
+    - streaming: Also emit partial transcripts while the user is speaking (ASR_STREAMING).
+
+    Returns:
+    - A stage whose `get` returns transcripts in order: TranscriptEvents when streaming,
+      otherwise the non-empty transcript strings.
+    """
+    if streaming:
+        return StreamingASRStage(model, capture)
+
+    def process(audio):
+        text = transcribe_audio(model, audio)
+        return text if text and text.strip() else None
+
+    return PipelineStage(process, capture.utterances, name="asr")
 
-    # Check if the recorded chunk contains silence
-    try:
-        samplerate, data = wavfile.read(temp_file_path)
-        if is_silence(data):
-            os.remove(temp_file_path)
-            return True
-        else:
-            return False
-    except Exception as e:
-        print(f"Error while reading audio file: {e}")
 
+def wait_for_transcript(asr, capture, idle_timeout=5, on_partial=None):
+    """
+    Wait for the next final transcript from an ASR stage.
+
+    Parameters:
+    - asr: The stage returned by `transcribe_utterances`.
+    - capture: The AudioCapture feeding it.
+    - idle_timeout: Seconds of silence after which the user is considered done.
+    - on_partial: Optional callback receiving each partial TranscriptEvent.
 
-def load_whisper():
+    Returns:
+    - The transcript, or None if the user said nothing for idle_timeout seconds.
+    """
+    while True:
+        text = asr.get(timeout=idle_timeout)
+        if isinstance(text, TranscriptEvent):
+            if not text.is_final:
+                if on_partial is not None:
+                    on_partial(text)
+                continue
+            text = text.text
+        # Keep waiting while the user is mid-sentence or an utterance is still being transcribed
+        if text is not None or not (capture.in_speech or asr.busy):
+            return text
+
+
+def load_whisper(size=None, device=None, dtype=None, profile=None):
     """
-    Load the 'base' model using the whisper library.
+    Load a Whisper model through the process-wide model manager.
 
     Size	Parameters	English-only model	Multilingual model	Required VRAM	Relative speed
     tiny	39 M	    tiny.en	            tiny	            ~1 GB	        ~32x
@@ -83,59 +173,56 @@ def load_whisper():
     medium	769 M	    medium.en	        medium	            ~5 GB	        ~2x
     large	1550 M	    N/A	                large	            ~10 GB	        1x
 
+    The model is loaded (and warmed up) only the first time a configuration is requested;
+    later calls, including Streamlit reruns, get the same instance back.
+
     Parameters:
-    - None
+    - size: Model name. Defaults to the WHISPER_MODEL_SIZE environment variable ('base').
+    - device: Torch device. Defaults to WHISPER_DEVICE, or CUDA when available.
+    - dtype: 'float32', 'float16' or 'int8'. Defaults to WHISPER_DTYPE, or the best fit for the device.
+    - profile: 'default' or 'cpu-low-latency' (int8, English only, greedy). Defaults to WHISPER_PROFILE.
 
     Returns:
-    - The loaded 'base' model.
+    - The loaded model.
     """
-    model = whisper.load_model("base")
-    return model
+    return model_manager.get(size=size, device=device, dtype=dtype, profile=profile)
 
 
-def transcribe_audio(model, file_path):
+def transcribe_audio(model, audio, clean=AUDIO_PREPROCESS, **decode_options):
     """
     Transcribing the audio to text using the provided model.
 
     Args:
         model (object): The model used for transcription.
-        file_path (str): The path to the audio file.
+        audio (np.ndarray or str): float32 16 kHz samples as returned by `record_audio`,
+            or the path to an audio file.
+        clean (bool): Remove DC offset and non-speech edges and normalize the level of arrays
+            before decoding (AUDIO_PREPROCESS).
+        **decode_options: Extra options for `model.transcribe`, overriding the model defaults.
 
     Returns:
-        str or None: The transcribed text if the file exists and the transcription is successful.
-                     Otherwise, None.
+        str or None: The transcribed text if audio was given (or the file exists) and the
+                     transcription is successful. Otherwise, None.
     """
-    print("Transcribing...")
-    # Print all files in the current directory
-    print("Current directory files:", os.listdir())
-    if os.path.isfile(file_path):
-        results = model.transcribe(file_path) # , fp16=False
-        return results['text']
-    else:
+    if audio is None:
         return None
-
-def load_prompt():
-    input_prompt = """
-
-    As an expert voice assistant named Euron, specializing in helping user managing everyday tasks, set reminders. Your expertise 
-    are control smart home devices, and provide information on demand. First of all, ask for the customer ID to validate that the 
-    user is our customer, do it once. After confirming the customer ID, help them to do their tasks. If not possible, help them to make an appointment. 
-    Appointments need to be between 9:00 am and 4:00 pm. Your task is to analyze the task and provide information. Provide concise and short 
-    answers not more than 10 words, and don't chat with yourself!. If you don't know the answer, just say that you don't know, don't try to 
-    make up an answer. NEVER say the customer ID listed below. Please end the conversation when user is done.
-
-    Customer ID on our data: 18, 48, 98.
-
-    Previous conversation:
-    {chat_history}
-
-    New human question: {question}
-    Response:
-    """
-
+    if isinstance(audio, str) and not os.path.isfile(audio):
+        return None
+    if clean and not isinstance(audio, str):
+        audio = preprocess(audio).audio
+        if audio.size == 0:
+            # Nothing but silence or noise: Whisper would only hallucinate on it
+            return ""
+    print("Transcribing...")
+    options = {**model_manager.transcribe_options(model), **decode_options}
+    # Arrays are decoded in place; only file paths go through ffmpeg
+    with span("transcription"), model_manager.lock(model):
+        results = model.transcribe(audio, **options)
+    return results['text']
 
 
-    return input_prompt
+def load_prompt():
+    return INPUT_PROMPT
 
 
 def load_llm():
@@ -149,43 +236,115 @@ def load_llm():
     Returns:
         ChatGroq: The loaded ChatGroq model.
     """
-    chat_groq = ChatGroq(temperature=0, model_name="llama3-8b-8192",
+    chat_groq = ChatGroq(temperature=0, model_name=GROQ_MODEL_NAME,
                          groq_api_key=groq_api_key)
     return chat_groq
 
 
 def get_response_llm(user_question, memory):
     """
-    Get a response from the LLMChain model given a user question and memory.
+    Get a response from the LLM given a user question and memory.
 
     Args:
         user_question (str): The question asked by the user.
         memory (Memory): The memory object to store the chat history.
 
     Returns:
-        str: The response text generated by the LLMChain model.
+        str: The response text generated by the LLM.
 
     Description:
-        This function loads the input prompt and the LLMChain model. It then creates a prompt template using the input prompt and initializes the LLMChain with the loaded model, prompt template, and memory. Finally, it invokes the LLMChain with the user question and returns the response text.
+        This function hands the question to the process-wide assistant engine, which keeps the prompt template, the ChatGroq client and its HTTP connections alive between calls. The engine fills the prompt with the chat history from the given memory, invokes the LLM, records the turn in the memory and returns the response text.
     """
-    input_prompt = load_prompt()
+    return get_engine().respond(user_question, memory)
 
-    chat_groq = load_llm()
 
-    # Look how "chat_history" is an input variable to the prompt template
-    prompt = PromptTemplate.from_template(input_prompt)
-    logger.info(f"Prompt: {prompt}")
+async def aget_response_llm(user_question, memory):
+    """
+    Async version of `get_response_llm` for use inside an event loop.
+
+    Args:
+        user_question (str): The question asked by the user.
+        memory (Memory): The memory object to store the chat history.
+
+    Returns:
+        str: The response text generated by the LLM.
+    """
+    return await get_engine().arespond(user_question, memory)
+
+
+def astream_response_llm(user_question, memory):
+    """
+    Stream a response from the LLM, token by token, inside an event loop.
+
+    Args:
+        user_question (str): The question asked by the user.
+        memory (Memory): The memory object to store the chat history.
+
+    Returns:
+        AsyncIterator[str]: Chunks of the response text as they are generated.
+    """
+    return get_engine().astream(user_question, memory)
 
-    chain = LLMChain(
-        llm=chat_groq,
-        prompt=prompt,
-        verbose=True,
-        memory=memory
-    )
 
-    response = chain.invoke({"question": user_question})
+def stream_response_llm(user_question, memory):
+    """
+    Stream a response from the LLM, yielding text chunks as they are generated.
 
-    return response['text']
+    Args:
+        user_question (str): The question asked by the user.
+        memory (Memory): The memory object to store the chat history.
+
+    Returns:
+        Iterator[str]: Chunks of the response text.
+    """
+    return get_engine().stream(user_question, memory)
+
+
+_speech_pipeline = None
+
+
+def get_speech_pipeline():
+    """Return the process-wide SpeechPipeline, creating it on first use."""
+    global _speech_pipeline
+    if _speech_pipeline is None:
+        _speech_pipeline = SpeechPipeline(cache=TTSCache())
+        if TTS_PRELOAD_FILE:
+            # Warm the cache with the phrases Euron repeats most without delaying the first reply
+            phrases = read_phrases(TTS_PRELOAD_FILE)
+            threading.Thread(target=_speech_pipeline.preload, args=(phrases,), daemon=True).start()
+    return _speech_pipeline
+
+
+def set_speech_pipeline(pipeline):
+    """Replace the process-wide SpeechPipeline, e.g. with one using another backend or sink."""
+    global _speech_pipeline
+    _speech_pipeline = pipeline
+
+
+def enable_barge_in(capture, echo_gate=BARGE_IN_ECHO_GATE, owner=None):
+    """
+    Stop the reply being spoken as soon as the user starts talking over it.
+
+    Parameters:
+    - capture: The AudioCapture that keeps listening during playback.
+    - echo_gate: Ignore microphone audio quieter than the reply being played (BARGE_IN_ECHO_GATE),
+      so the assistant does not interrupt itself through the speakers.
+    - owner: Only interrupt replies spoken for this owner (see `play_text_stream_to_speech`),
+      so one conversation cannot cut off another's reply.
+
+    The interrupted reply stops playing within one audio buffer, the LLM stream behind it is
+    closed, and the new utterance is captured from its first frame, pre-roll included.
+    """
+    pipeline = get_speech_pipeline()
+    if echo_gate:
+        capture.echo_reference = pipeline.sink
+
+    def on_speech_start():
+        if pipeline.interrupt(owner):
+            BARGE_INS.inc()
+            logger.info("Barge-in: the user started speaking, stopped the reply")
+
+    capture.on_speech_start.append(on_speech_start)
 
 
 def play_text_to_speech(text, language='en', slow=False):
@@ -200,34 +359,26 @@ def play_text_to_speech(text, language='en', slow=False):
     Returns:
         None
 
-    This function generates text-to-speech audio from the provided text, saves it to a temporary file,
-    initializes the pygame mixer for audio playback, loads the temporary audio file into the mixer,
-    starts playing the audio, waits until the audio playback finishes, stops the audio playback,
-    and cleans up by quitting the pygame mixer and removing the temporary audio file.
+    The text is split into sentences, and each sentence is synthesized in memory while the
+    previous one is playing, so playback starts after the first sentence is ready.
     """
-    # Generate text-to-speech audio from the provided text
-    tts = gTTS(text=text, lang=language, slow=slow, tld='com.au')
+    get_speech_pipeline().speak([text], language=language, slow=slow)
 
-    # Save the generated audio to a temporary file
-    temp_audio_file = "temp_audio.mp3"
-    tts.save(temp_audio_file)
 
-    # Initialize the pygame mixer for audio playback
-    pygame.mixer.init()
-
-    # Load the temporary audio file into the mixer
-    pygame.mixer.music.load(temp_audio_file)
-
-    # Start playing the audio
-    pygame.mixer.music.play()
+def play_text_stream_to_speech(chunks, language='en', slow=False, owner=None):
+    """
+    Speak text while it is still being generated.
 
-    # Wait until the audio playback finishes
-    while pygame.mixer.music.get_busy():
-        pygame.time.Clock().tick(10)  # Control the playback speed
+    Args:
+        chunks (Iterable[str]): Text pieces, e.g. from `stream_response_llm`.
+        language (str, optional): The language of the text. Defaults to 'en'.
+        slow (bool, optional): Whether to slow down the speech audio. Defaults to False.
+        owner (Hashable, optional): Conversation the reply belongs to, e.g. its session id.
 
-    # Stop the audio playback
-    pygame.mixer.music.stop()
+    Returns:
+        str: The complete text that was spoken.
 
-    # Clean up: Quit the pygame mixer and remove the temporary audio file
-    pygame.mixer.quit()
-    os.remove(temp_audio_file)
\ No newline at end of file
+    Each sentence or clause is synthesized as soon as it is complete and queued for gapless
+    playback, so speech starts after the first clause instead of after the whole reply.
+    """
+    return get_speech_pipeline().speak(chunks, language=language, slow=slow, owner=owner)
@@ -0,0 +1,347 @@
+"""
+Streamlit front-end shared by `app.py` and `euron_app.py`.
+
+The voice conversation runs in a VoiceWorker thread, not in the Streamlit script: the script
+only starts and stops the worker, kept in `st.session_state`, and renders its messages into
+placeholders. Reruns therefore leave the call alone and take milliseconds, since the model
+and the page assets are cached per process. The two apps differ only in how a transcript is
+turned into a reply, which they pass in as a responder factory.
+"""
+import time
+import uuid
+import base64
+import logging
+import threading
+
+import streamlit as st
+
+from src.logger import logger
+from src.capture import BARGE_IN, AudioCapture
+from src.metrics import start_metrics_server, turn_context
+from utils import (transcribe_utterances, wait_for_transcript, play_text_stream_to_speech, load_whisper,
+                   enable_barge_in, get_speech_pipeline)
+
+logging.basicConfig(level=logging.INFO)
+
+ABOUT = """
+    ## Euron Voice Assistant
+
+    **GitHub**: https://github.com/saisubhasish/EuronVoiceAssistant
+
+    The AI Assistant aims to help users manage daily tasks, set reminders,
+    control smart home devices, and provide information on demand. This versatile
+    voice assistant has been designed to integrate seamlessly with smart home devices
+    and calendar apps, ensuring efficient task management and accurate, timely information
+    for users. The assistant is trained on the latest updates and documentation relevant to
+    smart home technology and task management applications.
+"""
+
+# Custom CSS for the glowing border effect around the sidebar images
+GLOW_CSS = """
+<style>
+.cover-glow {
+    width: 100%;
+    height: auto;
+    padding: 3px;
+    box-shadow:
+        0 0 5px #330000,
+        0 0 10px #660000,
+        0 0 15px #990000,
+        0 0 20px #CC0000,
+        0 0 25px #FF0000,
+        0 0 30px #FF3333,
+        0 0 35px #FF6666;
+    position: relative;
+    z-index: -1;
+    border-radius: 30px;  /* Rounded corners */
+}
+</style>
+"""
+
+BASIC_INTERACTIONS = """
+### Basic Interactions
+- **Ask About Streamlit**: Ask your questions about Streamlit's latest updates, features, or issues.
+- **Search for Code**: Use keywords like 'code example', 'syntax', or 'how-to' to get relevant code snippets.
+- **Navigate Updates**: Switch to 'Updates' mode to browse the latest Streamlit updates in detail.
+"""
+
+ADVANCED_INTERACTIONS = """
+### Advanced Interactions
+- **Generate an App**: Use keywords like **generate app**, **create app** to get a basic Streamlit app code.
+- **Code Explanation**: Ask for **code explanation**, **walk me through the code** to understand the underlying logic of Streamlit code snippets.
+- **Project Analysis**: Use **analyze my project**, **technical feedback** to get insights and recommendations on your current Streamlit project.
+- **Debug Assistance**: Use **debug this**, **fix this error** to get help with troubleshooting issues in your Streamlit app.
+"""
+
+BUBBLE = '<div style="background-color: #f0f0f0; padding: 10px; border-radius: 5px;">{speaker}: {text}</div>'
+SPEAKERS = {"user": "Customer 👤", "assistant": "AI Assistant 🤖"}
+
+
+@st.cache_data
+def img_to_base64(image_path):
+    """Convert image to base64, once per process."""
+    with open(image_path, "rb") as img_file:
+        return base64.b64encode(img_file.read()).decode()
+
+
+@st.cache_data
+def glow_image(image_path):
+    """Return the HTML of a sidebar image with the glowing border."""
+    return f'<img src="data:image/png;base64,{img_to_base64(image_path)}" class="cover-glow">'
+
+
+@st.cache_resource
+def get_model():
+    """Load the Whisper model and start the metrics server (METRICS_PORT) once per process."""
+    model = load_whisper()
+    start_metrics_server()
+    return model
+
+
+class Responder:
+    """
+    Turns a final transcript into a reply for a VoiceWorker.
+
+    Subclasses implement `reply`; `on_partial` sees every partial transcript before that.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+    def on_partial(self, event):
+        pass
+
+    def reply(self, text, turn_id):
+        """Return the reply as an iterable of text chunks (a list with the full reply works too)."""
+        raise NotImplementedError
+
+
+class VoiceWorker:
+    """
+    One voice conversation running on a background thread.
+
+    The worker owns the capture, the ASR stage and the speech output. It publishes the
+    conversation as a list of messages that the UI reads with `snapshot`; `version` is
+    bumped on every change so the UI only redraws when something happened.
+    """
+
+    poll_interval = 0.5     # How quickly `stop` is noticed while waiting for the user
+
+    def __init__(self, model, make_responder, idle_timeout=5):
+        """
+        Args:
+            model: The Whisper model used for transcription.
+            make_responder (Callable[[str], Responder]): Called with the session id of the call.
+            idle_timeout (float): Seconds of silence after which the conversation ends.
+        """
+        self.model = model
+        self.session_id = uuid.uuid4().hex
+        self.responder = make_responder(self.session_id)
+        self.idle_timeout = idle_timeout
+        self.status = "starting"
+        self.error = None
+        self.version = 0
+        self._messages = []     # [role, text, final]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="voice-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """End the conversation, cutting off the reply being spoken."""
+        self._stopped.set()
+        self._update(status="stopping")
+        get_speech_pipeline().interrupt(self.session_id)
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def snapshot(self):
+        """Return (version, status, error, messages) as one consistent view."""
+        with self._lock:
+            return self.version, self.status, self.error, [tuple(m) for m in self._messages]
+
+    def _update(self, index=None, role=None, text=None, final=True, status=None):
+        """Change the status and/or append (index None) or update a message; returns its index."""
+        with self._lock:
+            if status is not None:
+                self.status = status
+            if text is not None:
+                if index is None:
+                    self._messages.append([role, text, final])
+                    index = len(self._messages) - 1
+                else:
+                    self._messages[index][1:] = [text, final]
+            self.version += 1
+        return index
+
+    def _run(self):
+        try:
+            # One capture for the whole conversation; it keeps listening while we transcribe, think and speak
+            with AudioCapture() as capture:
+                if BARGE_IN:
+                    # Talking over Euron cuts the reply short and starts the next turn
+                    enable_barge_in(capture, owner=self.session_id)
+                asr = transcribe_utterances(self.model, capture)
+                try:
+                    self._converse(asr, capture)
+                finally:
+                    asr.stop()
+        except OSError as e:
+            logger.error("Error: %s", e)
+            with self._lock:
+                self.error = "No default audio device found."
+        except Exception as e:
+            logger.exception("Voice conversation failed: %s", e)
+            with self._lock:
+                self.error = str(e)
+        finally:
+            self._update(status="stopped")
+            logger.info("End Conversation")
+
+    def _converse(self, asr, capture):
+        idle = 0.0
+        user = None     # Message showing the utterance in progress
+
+        def show_partial(event):
+            # Show what the user is saying while they are still speaking
+            nonlocal user
+            user = self._update(user, "user", f"{event.text} …", final=False)
+            self.responder.on_partial(event)
+
+        while not self._stopped.is_set():
+            if self.status != "listening":
+                self._update(status="listening")
+            text = wait_for_transcript(asr, capture, idle_timeout=self.poll_interval, on_partial=show_partial)
+            if text is None:
+                idle += self.poll_interval
+                if idle >= self.idle_timeout:
+                    logger.info("End Audio Stream as user did not say anything")
+                    return
+                continue
+            idle = 0.0
+            self._update(user, "user", text)
+            user = None
+            logger.info("User Question: %s", text)
+            self._respond(text)
+
+    def _respond(self, text):
+        self._update(status="thinking")
+        with turn_context(self.session_id) as turn_id:
+            assistant = None
+            parts = []
+
+            def show_tokens():
+                # Show the reply as it streams in while its first sentences are already being spoken
+                nonlocal assistant
+                for token in self.responder.reply(text, turn_id):
+                    if not parts:
+                        self._update(status="speaking")
+                    parts.append(token)
+                    assistant = self._update(assistant, "assistant", "".join(parts), final=False)
+                    yield token
+
+            response_llm = play_text_stream_to_speech(show_tokens(), owner=self.session_id)
+        if get_speech_pipeline().was_interrupted(self.session_id):
+            response_llm += " …"
+        self._update(assistant, "assistant", response_llm)
+        logger.info("AI Response: %s\n", response_llm)
+
+
+def render_page():
+    """Page configuration, title and sidebar; everything expensive in here is cached."""
+    st.set_page_config(
+        page_title="Euron Bot - An Intelligent Streamlit Assistant",
+        page_icon="images/euron_bot.png",
+        layout="wide",
+        initial_sidebar_state="expanded",
+        menu_items={"About": ABOUT},
+    )
+    st.title("Euron Voice Assistant")
+    st.markdown(GLOW_CSS, unsafe_allow_html=True)
+
+    st.sidebar.markdown(glow_image("images/euron_bot.png"), unsafe_allow_html=True)
+    st.sidebar.markdown("---")
+    # Sidebar for Mode Selection
+    mode = st.sidebar.radio("Select Mode:", options=["Talk with Euron Assistant"], index=0)
+    st.sidebar.markdown("---")
+    if st.sidebar.toggle("Show Basic Interactions", value=True):
+        st.sidebar.markdown(BASIC_INTERACTIONS)
+    if st.sidebar.toggle("Show Advanced Interactions", value=False):
+        st.sidebar.markdown(ADVANCED_INTERACTIONS)
+    st.sidebar.markdown("---")
+    st.sidebar.markdown(glow_image("images/euron.png"), unsafe_allow_html=True)
+    return mode
+
+
+def _start(model, make_responder):
+    st.session_state.voice_worker = VoiceWorker(model, make_responder).start()
+
+
+def _stop():
+    st.session_state.voice_worker.stop()
+
+
+def follow(worker, refresh=0.1):
+    """
+    Render the worker's conversation and keep it up to date until the worker stops.
+
+    Only messages that changed are redrawn, and an error is shown once. Any widget interaction
+    reruns the script, which ends this loop; the worker is not affected and the next run picks
+    it up again. Streamlit only notices the interaction when the script writes something, so
+    the status line is written on every tick, changed or not.
+    """
+    status = st.empty()
+    placeholders = []
+    rendered = []
+    version = None
+    shown_error = None
+    while True:
+        alive = worker.alive
+        current, state, error, messages = worker.snapshot()
+        status.caption(f"Status: {state}")
+        if current != version:
+            version = current
+            for i, (role, text, final) in enumerate(messages):
+                if i == len(placeholders):
+                    placeholders.append(st.empty())
+                    rendered.append(None)
+                if rendered[i] != (role, text, final):
+                    rendered[i] = (role, text, final)
+                    placeholders[i].markdown(BUBBLE.format(speaker=SPEAKERS[role], text=text), unsafe_allow_html=True)
+        if error and error != shown_error:
+            shown_error = error
+            st.error(error)
+        if not alive:
+            return
+        time.sleep(refresh)
+
+
+def run_app(make_responder):
+    """
+    Run the Streamlit page.
+
+    Args:
+        make_responder (Callable[[str], Responder]): Builds the reply strategy of a new call
+            from its session id.
+    """
+    mode = render_page()
+    model = get_model()
+
+    # Handle Chat and Update Modes
+    if mode == "Talk with Euron Assistant":
+        worker = st.session_state.get("voice_worker")
+        running = worker is not None and worker.alive
+        if running:
+            st.button("Stop Recording", on_click=_stop)
+        else:
+            st.button("Start Recording", on_click=_start, args=(model, make_responder))
+        if worker is not None:
+            follow(worker)
+            if running:
+                # The call ended while this run was following it; show the start button again
+                st.rerun()